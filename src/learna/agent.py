@@ -1,4 +1,3 @@
-from tensorforce.agents import PPOAgent, RandomAgent
 from dataclasses import dataclass
 
 from functools import partial
@@ -188,6 +187,9 @@ def get_agent(environment, network, agent_config, session_config, restore_path):
     Returns:
        An agent.
     """
+    # Imported here so that numpy-only inference does not load tensorflow
+    from tensorforce.agents import PPOAgent, RandomAgent
+
     if agent_config.random_agent:
         return RandomAgent(
             environment.states,
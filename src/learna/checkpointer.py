@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from pathlib import Path
+
+
+def rolling_distance(episodes_infos, window):
+    """
+    Mean normalized Hamming distance of the last episodes of several environments.
+
+    Args:
+        episodes_infos: The episodes_info list of each environment.
+        window: The number of last episodes per environment to average over.
+
+    Returns:
+        The mean distance, or None if there are no episodes yet.
+    """
+    distances = [
+        info.normalized_hamming_distance
+        for episodes_info in episodes_infos
+        for info in episodes_info[-window:]
+    ]
+    if not distances:
+        return None
+    return sum(distances) / len(distances)
+
+
+def _load_index(directory):
+    index_path = Path(directory, "checkpoints.json")
+    if not index_path.exists():
+        return []
+    return json.loads(index_path.read_text())
+
+
+def latest_checkpoint(directory):
+    """
+    Get the most recent checkpoint written by a Checkpointer.
+
+    Args:
+        directory: The directory of the Checkpointer.
+
+    Returns:
+        The checkpoint directory, usable as restore_path, or None.
+    """
+    index = _load_index(directory)
+    return Path(directory, index[-1]["name"]) if index else None
+
+
+def best_checkpoint(directory):
+    """
+    Get the checkpoint with the lowest rolling distance written by a Checkpointer.
+
+    Args:
+        directory: The directory of the Checkpointer.
+
+    Returns:
+        The checkpoint directory, usable as restore_path, or None.
+    """
+    index = [entry for entry in _load_index(directory) if entry["distance"] is not None]
+    if not index:
+        return None
+    return Path(directory, min(index, key=lambda entry: entry["distance"])["name"])
+
+
+class Checkpointer(object):
+    """
+    Save an agent periodically on a background thread. Keeps the last checkpoints and
+    the one with the lowest rolling distance, each in its own directory, and records
+    them in checkpoints.json.
+    """
+
+    def __init__(
+        self,
+        agent,
+        directory,
+        get_distance,
+        keep_last=3,
+        every_episodes=None,
+        every_seconds=None,
+    ):
+        """
+        Initialize the checkpointer.
+
+        Args:
+            agent: The tensorforce agent to save.
+            directory: The directory to write the checkpoints to.
+            get_distance: Function returning the current rolling distance, or None.
+            keep_last: The number of most recent checkpoints to keep.
+            every_episodes: If set, save after this many finished episodes.
+            every_seconds: If set, save after this many seconds.
+        """
+        self.agent = agent
+        self.directory = Path(directory)
+        self.get_distance = get_distance
+        self.keep_last = keep_last
+        self.every_episodes = every_episodes
+        self.every_seconds = every_seconds
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index = _load_index(self.directory)
+        # Number new checkpoints after the ones of an earlier run
+        self._number = max(
+            (int(entry["name"].rsplit("-", 1)[1]) + 1 for entry in self._index),
+            default=0,
+        )
+        self._episodes = 0
+        self._last_episodes = 0
+        self._last_time = time.time()
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background thread, waiting for a checkpoint in progress.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+
+    def episode_finished(self):
+        """
+        Count a finished episode, called by the workers.
+        """
+        with self._condition:
+            self._episodes += 1
+            if self._due():
+                self._condition.notify()
+
+    def _due(self):
+        return (
+            self.every_episodes is not None
+            and self._episodes - self._last_episodes >= self.every_episodes
+            or self.every_seconds is not None
+            and time.time() - self._last_time >= self.every_seconds
+        )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and not self._due():
+                    timeout = None
+                    if self.every_seconds is not None:
+                        elapsed = time.time() - self._last_time
+                        timeout = max(self.every_seconds - elapsed, 0)
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+                self._last_episodes = self._episodes
+                self._last_time = time.time()
+            self.save()
+
+    def save(self):
+        """
+        Write a checkpoint and apply the retention policy.
+
+        Returns:
+            The checkpoint directory.
+        """
+        scratch = self.directory.joinpath("scratch")
+        scratch.mkdir(exist_ok=True)
+        # The agent's saver deletes its old files itself, so move them out of its way
+        prefix = Path(self.agent.save_model(directory=str(scratch.joinpath("model"))))
+        # Skip directories left behind by a failed prune
+        while self.directory.joinpath(f"checkpoint-{self._number}").exists():
+            self._number += 1
+        name = f"checkpoint-{self._number}"
+        self._number += 1
+        checkpoint = self.directory.joinpath(name)
+        checkpoint.mkdir()
+        for path in scratch.glob(prefix.name + ".*"):
+            shutil.move(str(path), str(checkpoint.joinpath(path.name)))
+        checkpoint.joinpath("checkpoint").write_text(
+            f'model_checkpoint_path: "{prefix.name}"\n'
+            f'all_model_checkpoint_paths: "{prefix.name}"\n'
+        )
+
+        self._index.append(
+            dict(name=name, episodes=self._episodes, distance=self.get_distance())
+        )
+        removed = self._prune()
+        index_path = self.directory.joinpath("checkpoints.json")
+        index_path.with_suffix(".tmp").write_text(json.dumps(self._index))
+        os.replace(index_path.with_suffix(".tmp"), index_path)
+        for entry in removed:
+            shutil.rmtree(self.directory.joinpath(entry["name"]), ignore_errors=True)
+        return checkpoint
+
+    def _prune(self):
+        scored = [entry for entry in self._index if entry["distance"] is not None]
+        best = min(scored, key=lambda entry: entry["distance"]) if scored else None
+        keep = self._index[len(self._index) - self.keep_last :] + [best]
+        removed = [entry for entry in self._index if entry not in keep]
+        self._index = [entry for entry in self._index if entry in keep]
+        return removed
@@ -0,0 +1,71 @@
+"""
+    Testsuite for the checkpointer.
+"""
+
+import time
+
+from .environment import EpisodeInfo
+from .checkpointer import rolling_distance
+from .checkpointer import latest_checkpoint
+from .checkpointer import best_checkpoint
+from .checkpointer import Checkpointer
+
+
+class _Agent(object):
+    def __init__(self):
+        self.timestep = 0
+
+    def save_model(self, directory):
+        self.timestep += 1
+        prefix = f"{directory}-{self.timestep}"
+        for suffix in (".index", ".meta"):
+            with open(prefix + suffix, "w") as checkpoint_file:
+                checkpoint_file.write(str(self.timestep))
+        return prefix
+
+
+def test_rolling_distance():
+    episodes_infos = [
+        [EpisodeInfo(0, 0.0, distance) for distance in (0.9, 0.5, 0.3)],
+        [EpisodeInfo(0, 0.0, 0.1)],
+    ]
+    assert 0.3 == rolling_distance(episodes_infos, window=2)
+    assert rolling_distance([[], []], window=2) is None
+
+
+def test_Checkpointer(tmp_path):
+    distances = iter([0.5, 0.2, 0.4, 0.6, 0.7])
+    checkpointer = Checkpointer(
+        _Agent(), tmp_path, lambda: next(distances), keep_last=2
+    )
+
+    # Test retention of the last checkpoints and the best one
+    checkpoints = []
+    for _ in range(5):
+        checkpoints.append(checkpointer.save())
+    assert [f"checkpoint-{i}" for i in range(5)] == [c.name for c in checkpoints]
+    assert checkpoints[-1] == latest_checkpoint(tmp_path)
+    assert checkpoints[1] == best_checkpoint(tmp_path)
+    assert [False, True, False, True, True] == [c.exists() for c in checkpoints]
+    assert "5" == checkpoints[-1].joinpath("model-5.index").read_text()
+    assert 'model_checkpoint_path: "model-5"' in (
+        checkpoints[-1].joinpath("checkpoint").read_text()
+    )
+
+    # Test resuming keeps the index
+    checkpointer = Checkpointer(_Agent(), tmp_path, lambda: None, keep_last=2)
+    assert 3 == len(checkpointer._index)
+    assert "checkpoint-5" == checkpointer.save().name
+
+
+def test_Checkpointer_background(tmp_path):
+    checkpointer = Checkpointer(
+        _Agent(), tmp_path, lambda: None, every_episodes=2
+    ).start()
+    for _ in range(3):
+        checkpointer.episode_finished()
+    deadline = time.time() + 5
+    while latest_checkpoint(tmp_path) is None and time.time() < deadline:
+        time.sleep(0.01)
+    checkpointer.stop()
+    assert latest_checkpoint(tmp_path) is not None
@@ -1,19 +1,26 @@
+import os
 import time
 
-import tensorflow as tf
-from ..tensorforce.runner import Runner
+from functools import partial
+
+from ..tensorforce.runner import Runner, get_restart_strategy
 
 from .agent import NetworkConfig, get_network, AgentConfig, get_agent_fn
 from .environment import RnaDesignEnvironment, RnaDesignEnvironmentConfig
+from .numpy_policy import NumpyAgent, NumpyPolicy
+from .policy import TensorforcePolicy, PolicyCache
+from .profiling import PhaseTimer, ChromeTracer, format_timings
+from .metrics import get_sink
 
 
-def _get_episode_finished(timeout, stop_once_solved):
+def _get_episode_finished(timeout, stop_once_solved, sink):
     """
     Check for timeout after each episode of designing one entire target structure.
 
     Args:
         timeout: Maximum time allowed to solve one target structure.
         stop_once_solved: Defines if agent should stop after solving a target structure.
+        sink: The metrics sink to write the result of each episode to.
 
     Returns:
         episode_finish: Inner function that handles timeout.
@@ -27,7 +34,15 @@ def _get_episode_finished(timeout, stop_once_solved):
         last_reward = runner.episode_rewards[-1]
         last_fractional_hamming = env.episodes_info[-1].normalized_hamming_distance
         elapsed_time = time.time() - start_time
-        print(elapsed_time, last_reward, last_fractional_hamming, candidate_solution)
+        sink.write(
+            dict(
+                elapsed_time=elapsed_time,
+                reward=last_reward,
+                normalized_hamming_distance=last_fractional_hamming,
+                candidate=candidate_solution,
+            ),
+            force=last_reward == 1.0,
+        )
 
         no_timeout = not timeout or elapsed_time < timeout
         stop_since_solved = stop_once_solved and last_reward == 1.0
@@ -37,6 +52,71 @@ def _get_episode_finished(timeout, stop_once_solved):
     return episode_finished
 
 
+# The restored agent of this process, see _get_cached_agent_fn
+_agent_cache = {}
+
+
+def _get_cached_agent_fn(get_agent, key):
+    """
+    Get a function returning the agent of <get_agent>, building it only once per
+    process for the same <key>. Only the agent of the latest key is kept open.
+
+    Args:
+        get_agent: Function building the agent.
+        key: Identifies the network, configurations and restored model of the agent.
+
+    Returns:
+        get_cached_agent: Inner function returning the cached agent.
+    """
+
+    def get_cached_agent():
+        if key not in _agent_cache:
+            for agent in _agent_cache.values():
+                agent.close()
+            _agent_cache.clear()
+            _agent_cache[key] = get_agent()
+        return _agent_cache[key]
+
+    return get_cached_agent
+
+
+def _get_policy(agent):
+    """
+    Get the action distribution of an agent as a policy object.
+
+    Args:
+        agent: A tensorforce agent or a NumpyAgent.
+
+    Returns:
+        The policy of the agent.
+    """
+    if isinstance(agent, NumpyAgent):
+        return agent.policy
+    return TensorforcePolicy(agent)
+
+
+def _get_cached_policy_fn(cache_size):
+    """
+    Get a function wrapping the policy of a frozen agent into an LRU cache. Recurrent
+    policies depend on more than the state and are left uncached.
+
+    Args:
+        cache_size: Maximum number of states to cache the action distribution for.
+
+    Returns:
+        get_policy: Inner function taking an agent and returning the cached policy.
+    """
+
+    def get_policy(agent):
+        policy = _get_policy(agent)
+        if policy.recurrent:
+            print("Warning: not caching the outputs of a recurrent policy")
+            return policy
+        return PolicyCache(policy, cache_size)
+
+    return get_policy
+
+
 def design_rna(
     dot_brackets,
     timeout,
@@ -46,6 +126,20 @@ def design_rna(
     network_config,
     agent_config,
     env_config,
+    policy_cache_size=0,
+    numpy_policy_path=None,
+    shared_feature_map=False,
+    population_size=1,
+    beam_width=None,
+    restart_strategy="fixed",
+    restart_factor=2.0,
+    in_place_restarts=False,
+    profile=False,
+    trace_path=None,
+    metrics_path=None,
+    metrics_format="jsonl",
+    metrics_sample_rate=1.0,
+    cache_agent=False,
 ):
     """
     Main function for RNA design. Instantiate an environment and an agent to run in a
@@ -60,39 +154,131 @@ def design_rna(
         network_config: The configuration of the network.
         agent_config: The configuration of the agent.
         env_config: The configuration of the environment.
+        policy_cache_size: If set together with <stop_learning>, cache the action
+            distribution of up to this many states instead of querying the agent.
+            Ignored for recurrent policies.
+        numpy_policy_path: If set, act with the policy exported to this .npz file
+            instead of building a tensorforce agent. Requires <stop_learning>.
+        shared_feature_map: If set, the numpy policy computes its embedding and
+            convolutions once per target instead of once per state. Not supported
+            with <population_size> or <beam_width>.
+        population_size: Number of candidate solutions to design per episode from a
+            single pass of the policy. The best one is reported.
+        beam_width: If set, first design the <beam_width> most likely candidate
+            solutions of the frozen policy, then continue sampling. Requires
+            <stop_learning>.
+        restart_strategy: When to restart the agent. One of fixed (every
+            <restart_timeout> seconds), luby (<restart_timeout> times the Luby
+            sequence), geometric (<restart_timeout> growing by <restart_factor>) and
+            progress (once the best distance has not improved for <restart_timeout>).
+        restart_factor: The growth factor of the geometric restart strategy.
+        in_place_restarts: If set, restart a tensorforce agent within its existing
+            graph instead of closing and rebuilding it: the variables, including the
+            optimizer slots and the global step and episode counters, are reset to
+            their restored values, or rerun their initializers without a
+            <restore_path>.
+        profile: If set, measure the time spent per phase and print it at the end.
+        trace_path: If set, write a Chrome trace of all phases to this file.
+        metrics_path: If set, write the result of each episode to this file instead
+            of printing it.
+        metrics_format: The format of the metrics file, jsonl or csv.
+        metrics_sample_rate: Fraction of the episodes to write or print. Solved
+            episodes are always included.
+        cache_agent: If set, keep the restored agent open for further calls in the
+            same process with the same model and configurations, e.g. from a pool
+            evaluating many targets. Requires <stop_learning> and <restore_path>.
 
     Returns:
         Episode information.
     """
-    session_config = tf.ConfigProto(
-        intra_op_parallelism_threads=1,
-        inter_op_parallelism_threads=1,
-        allow_soft_placement=True,
-        device_count={"CPU": 1},
-    )
-
     env_config.use_conv = any(map(lambda x: x > 1, network_config.conv_sizes))
     env_config.use_embedding = bool(network_config.embedding_size)
-    environment = RnaDesignEnvironment(dot_brackets, env_config)
+    if beam_width and not stop_learning:
+        raise ValueError("Beam search decoding requires stop_learning")
+    if cache_agent and not (stop_learning and restore_path):
+        raise ValueError("Caching the agent requires stop_learning and restore_path")
+    if shared_feature_map and (population_size > 1 or beam_width):
+        raise ValueError("The shared feature map requires a single design per episode")
 
-    network = get_network(network_config)
-    # Runner restarts the agent by calling get_agent again
-    get_agent = get_agent_fn(
-        environment=environment,
-        network=network,
-        agent_config=agent_config,
-        session_config=session_config,
-        restore_path=restore_path,
+    tracer = ChromeTracer(trace_path) if trace_path else None
+    timer = PhaseTimer(enabled=profile or bool(trace_path), tracer=tracer)
+    environment = RnaDesignEnvironment(dot_brackets, env_config, timer=timer)
+
+    if numpy_policy_path:
+        if not stop_learning:
+            raise ValueError("A numpy policy can only be used with stop_learning")
+        get_agent = partial(
+            NumpyAgent,
+            NumpyPolicy.load(numpy_policy_path),
+            environment=environment if shared_feature_map else None,
+        )
+        restart_weights = None
+    else:
+        # Imported here so that numpy-only inference does not load tensorflow
+        import tensorflow as tf
+
+        session_config = tf.ConfigProto(
+            intra_op_parallelism_threads=1,
+            inter_op_parallelism_threads=1,
+            allow_soft_placement=True,
+            device_count={"CPU": 1},
+        )
+        network = get_network(network_config)
+        get_agent = get_agent_fn(
+            environment=environment,
+            network=network,
+            agent_config=agent_config,
+            session_config=session_config,
+            restore_path=restore_path,
+        )
+        if cache_agent:
+            # The model may be overwritten in place, e.g. when training continues
+            checkpoint = os.path.join(restore_path, "checkpoint")
+            key = (
+                str(restore_path),
+                os.stat(checkpoint).st_mtime_ns if os.path.exists(checkpoint) else None,
+                repr(network_config),
+                repr(agent_config),
+                repr(env_config),
+            )
+            get_agent = _get_cached_agent_fn(get_agent, key)
+        restart_weights = None  # Close and rebuild the agent
+        if in_place_restarts:
+            restart_weights = "snapshot" if restore_path else "initializer"
+    get_policy = None
+    if stop_learning and policy_cache_size:
+        get_policy = _get_cached_policy_fn(policy_cache_size)
+    elif population_size > 1 or beam_width:
+        get_policy = _get_policy
+    runner = Runner(
+        get_agent,
+        environment,
+        get_policy=get_policy,
+        restart_weights=restart_weights,
+        timer=timer,
+        close_agent=not cache_agent,
     )
-    runner = Runner(get_agent, environment)
 
     stop_once_solved = len(dot_brackets) == 1
-    runner.run(
-        deterministic=False,
-        restart_timeout=restart_timeout,
-        stop_learning=stop_learning,
-        episode_finished=_get_episode_finished(timeout, stop_once_solved),
-    )
+    sink = get_sink(metrics_path, metrics_format, sample_rate=metrics_sample_rate)
+    try:
+        runner.run(
+            deterministic=False,
+            restart_timeout=restart_timeout,
+            stop_learning=stop_learning,
+            episode_finished=_get_episode_finished(timeout, stop_once_solved, sink),
+            population_size=population_size,
+            beam_width=beam_width,
+            restart_strategy=get_restart_strategy(
+                restart_strategy, restart_timeout, restart_factor
+            ),
+        )
+    finally:
+        sink.close()
+    if profile:
+        print(format_timings(runner.get_timings()))
+    if trace_path:
+        tracer.close()
     return environment.episodes_info
 
 
@@ -122,6 +308,55 @@ if __name__ == "__main__":
     parser.add_argument("--restore_path", type=Path, help="From where to load model")
     parser.add_argument("--stop_learning", action="store_true", help="Stop learning")
     parser.add_argument("--random_agent", action="store_true", help="Use random agent")
+    parser.add_argument(
+        "--policy_cache_size",
+        default=0,
+        type=int,
+        help="Number of states to cache the frozen policy's output for, unless recurrent",
+    )
+    parser.add_argument(
+        "--numpy_policy_path",
+        type=Path,
+        help="Act with a policy exported by src.learna.numpy_policy, no tensorflow",
+    )
+    parser.add_argument(
+        "--shared_feature_map",
+        action="store_true",
+        help="Compute the numpy policy's convolutions once per target",
+    )
+    parser.add_argument(
+        "--population_size",
+        default=1,
+        type=int,
+        help="Number of designs to sample per episode from one policy pass",
+    )
+    parser.add_argument(
+        "--beam_width",
+        type=int,
+        help="First try this many most likely designs of the frozen policy",
+    )
+
+    parser.add_argument(
+        "--profile", action="store_true", help="Print the time spent per phase"
+    )
+    parser.add_argument(
+        "--trace_path", type=Path, help="Where to write a Chrome trace of all phases"
+    )
+    parser.add_argument(
+        "--metrics_path", type=Path, help="Where to write episode results to"
+    )
+    parser.add_argument(
+        "--metrics_format",
+        default="jsonl",
+        choices=["jsonl", "csv"],
+        help="Format of the episode results file",
+    )
+    parser.add_argument(
+        "--metrics_sample_rate",
+        default=1.0,
+        type=float,
+        help="Fraction of episode results to write",
+    )
 
     # Timeout behaviour
     parser.add_argument("--timeout", default=None, type=int, help="Maximum time to run")
@@ -158,6 +393,23 @@ if __name__ == "__main__":
     parser.add_argument(
         "--restart_timeout", type=int, help="Time after which to restart the agent"
     )
+    parser.add_argument(
+        "--restart_strategy",
+        default="fixed",
+        choices=["fixed", "luby", "geometric", "progress"],
+        help="How to schedule restarts based on the restart timeout",
+    )
+    parser.add_argument(
+        "--restart_factor",
+        default=2.0,
+        type=float,
+        help="Growth of the restart interval for the geometric strategy",
+    )
+    parser.add_argument(
+        "--in_place_restarts",
+        action="store_true",
+        help="Reset the agent's variables on restarts instead of rebuilding it",
+    )
     parser.add_argument("--lstm_units", type=int, help="The number of lstm units")
     parser.add_argument("--num_lstm_layers", type=int, help="The number of lstm layers")
     parser.add_argument("--embedding_size", type=int, help="The size of the embedding")
@@ -200,4 +452,17 @@ if __name__ == "__main__":
         network_config=network_config,
         agent_config=agent_config,
         env_config=env_config,
+        policy_cache_size=args.policy_cache_size,
+        numpy_policy_path=args.numpy_policy_path,
+        shared_feature_map=args.shared_feature_map,
+        population_size=args.population_size,
+        beam_width=args.beam_width,
+        restart_strategy=args.restart_strategy,
+        restart_factor=args.restart_factor,
+        in_place_restarts=args.in_place_restarts,
+        profile=args.profile,
+        trace_path=args.trace_path,
+        metrics_path=args.metrics_path,
+        metrics_format=args.metrics_format,
+        metrics_sample_rate=args.metrics_sample_rate,
     )
@@ -5,10 +5,12 @@ from dataclasses import dataclass
 from distance import hamming
 
 import numpy as np
-from tensorforce.environments import Environment
 
 from RNA import fold
 
+from .profiling import PhaseTimer
+from .sampling import UniformSampler
+
 
 @dataclass
 class RnaDesignEnvironmentConfig:
@@ -94,16 +96,20 @@ class _Target(object):
 
     _id_counter = 0
 
-    def __init__(self, dot_bracket, env_config):
+    def __init__(self, dot_bracket, env_config, target_id=None):
         """
         Initialize a target structure.
 
         Args:
              dot_bracket: dot_bracket encoded target structure.
              env_config: The environment configuration.
+             target_id: Optional id, e.g. to number targets across processes. By
+                default targets are numbered in the order they are created.
         """
-        _Target._id_counter += 1
-        self.id = _Target._id_counter  # For processing results
+        if target_id is None:
+            _Target._id_counter += 1
+            target_id = _Target._id_counter
+        self.id = target_id  # For processing results
         self.dot_bracket = dot_bracket
         self._pairing_encoding = _encode_pairing(self.dot_bracket)
         self.padded_encoding = _encode_dot_bracket(self.dot_bracket, env_config)
@@ -194,18 +200,6 @@ class _Design(object):
         return "".join(self._primary_list)
 
 
-def _random_epoch_gen(data):
-    """
-    Generator to get epoch data.
-
-    Args:
-        data: The targets of the epoch
-    """
-    while True:
-        for i in np.random.permutation(len(data)):
-            yield data[i]
-
-
 @dataclass
 class EpisodeInfo:
     """
@@ -218,25 +212,39 @@ class EpisodeInfo:
     normalized_hamming_distance: float
 
 
-class RnaDesignEnvironment(Environment):
+class RnaDesignEnvironment(object):
     """
-    The environment for RNA design using deep reinforcement learning.
+    The environment for RNA design using deep reinforcement learning. Implements the
+    tensorforce environment interface without inheriting from it, so that it can be
+    used without loading tensorflow.
     """
 
-    def __init__(self, dot_brackets, env_config):
+    def __init__(
+        self, dot_brackets, env_config, timer=None, get_sampler=None, target_ids=None
+    ):
         """TODO
         Initialize an environemnt.
 
         Args:
             env_config: The configuration of the environment.
+            timer: Optional PhaseTimer to measure folding and local improvement with.
+            get_sampler: Optional function taking the targets and returning the
+                sampler choosing the target of each episode. Uniform by default.
+            target_ids: Optional id of each target, reported in the episodes info.
         """
         self._env_config = env_config
+        self.timer = timer or PhaseTimer(enabled=False)
 
-        targets = [_Target(dot_bracket, self._env_config) for dot_bracket in dot_brackets]
-        self._target_gen = _random_epoch_gen(targets)
+        target_ids = target_ids or [None] * len(dot_brackets)
+        targets = [
+            _Target(dot_bracket, self._env_config, target_id)
+            for dot_bracket, target_id in zip(dot_brackets, target_ids)
+        ]
+        self._sampler = (get_sampler or UniformSampler)(targets)
 
         self.target = None
         self.design = None
+        self.population = None
         self.episodes_info = []
 
     def __str__(self):
@@ -252,7 +260,7 @@ class RnaDesignEnvironment(Environment):
         Returns:
             The first state.
         """
-        self.target = next(self._target_gen)
+        self.target = self._sampler.sample()
         self.design = _Design(len(self.target))
         return self._get_state()
 
@@ -292,7 +300,8 @@ class RnaDesignEnvironment(Environment):
         hamming_distances = []
         for mutation in product("AGCU", repeat=len(differing_sites)):
             mutated = self.design.get_mutated(mutation, differing_sites)
-            folded_mutated, _ = fold(mutated.primary)
+            with self.timer.phase("fold"):
+                folded_mutated, _ = fold(mutated.primary)
             hamming_distance = hamming(folded_mutated, self.target.dot_bracket)
             hamming_distances.append(hamming_distance)
             if hamming_distance == 0:  # For better timing results
@@ -312,10 +321,12 @@ class RnaDesignEnvironment(Environment):
         if not terminal:
             return 0
 
-        folded_design, _ = fold(self.design.primary)
+        with self.timer.phase("fold"):
+            folded_design, _ = fold(self.design.primary)
         hamming_distance = hamming(folded_design, self.target.dot_bracket)
         if 0 < hamming_distance < self._env_config.mutation_threshold:
-            hamming_distance = self._local_improvement(folded_design)
+            with self.timer.phase("local_improvement"):
+                hamming_distance = self._local_improvement(folded_design)
 
         normalized_hamming_distance = hamming_distance / len(self.target)
 
@@ -326,6 +337,7 @@ class RnaDesignEnvironment(Environment):
             normalized_hamming_distance=normalized_hamming_distance,
         )
         self.episodes_info.append(episode_info)
+        self._sampler.update(self.target, normalized_hamming_distance)
 
         return (1 - normalized_hamming_distance) ** self._env_config.reward_exponent
 
@@ -349,6 +361,79 @@ class RnaDesignEnvironment(Environment):
 
         return state, terminal, reward
 
+    def episode_states(self):
+        """
+        Get all states of an episode on the current target. They only depend on the
+        pairing of the target, not on the actions.
+
+        Returns:
+            The state of each timestep.
+        """
+        design = _Design(len(self.target))
+        states = []
+        while design.first_unassigned_site is not None:
+            site = design.first_unassigned_site
+            states.append(
+                self.target.padded_encoding[
+                    site : site + 2 * self._env_config.state_radius + 1
+                ]
+            )
+            design.assign_sites(0, site, self.target.get_paired_site(site))
+        return states
+
+    def reset_population(self, size, keep_target=False):
+        """
+        Reset the environment to design <size> candidate solutions of the same target
+        at once. The states do not depend on the actions, so all candidates share them.
+
+        Args:
+            size: The number of candidate solutions.
+            keep_target: If set, design for the current target instead of the next.
+
+        Returns:
+            The first state.
+        """
+        if not keep_target:
+            self.target = self._sampler.sample()
+        self.population = [_Design(len(self.target)) for _ in range(size)]
+        self.design = self.population[0]
+        return self._get_state()
+
+    def execute_population(self, actions):
+        """
+        Execute one interaction of the environment with the agent for each candidate
+        solution of the population. At the terminal timestep, the best candidate
+        becomes the design and its episode info is the last one.
+
+        Args:
+            actions: One action per candidate solution.
+
+        Returns:
+            state: The next state for the agent.
+            terminal: The signal for end of an episode.
+            rewards: The reward of each candidate if at terminal timestep, else 0s.
+        """
+        current_site = self.design.first_unassigned_site
+        paired_site = self.target.get_paired_site(current_site)
+        for design, action in zip(self.population, actions):
+            design.assign_sites(action, current_site, paired_site)
+
+        terminal = self.design.first_unassigned_site is None
+        if not terminal:
+            return self._get_state(), terminal, [0] * len(self.population)
+
+        rewards = []
+        for design in self.population:
+            self.design = design
+            rewards.append(self._get_reward(terminal))
+
+        best = int(np.argmax(rewards))
+        self.design = self.population[best]
+        population_info = self.episodes_info[-len(self.population) :]
+        population_info.append(population_info.pop(best))
+        self.episodes_info[-len(self.population) :] = population_info
+        return None, terminal, rewards
+
     def close(self):
         pass
 
@@ -362,3 +447,32 @@ class RnaDesignEnvironment(Environment):
     @property
     def actions(self):
         return dict(type="int", num_actions=4)
+
+
+def get_shard_environment(
+    dot_brackets, env_config, get_sampler, shard_index, shard_count
+):
+    """
+    Get an environment on every <shard_count>-th target structure, so that actors do
+    not design the same targets. Targets are numbered by their index in
+    <dot_brackets>, starting at 1, so that their ids are the same in every actor.
+
+    Args:
+        dot_brackets: All target structures.
+        env_config: The configuration of the environment.
+        get_sampler: Function taking the targets and returning a target sampler.
+        shard_index: The index of the shard.
+        shard_count: The number of shards.
+
+    Returns:
+        The environment.
+    """
+    indices = list(range(len(dot_brackets)))[shard_index::shard_count]
+    if not indices:  # More shards than targets
+        indices = [shard_index % len(dot_brackets)]
+    return RnaDesignEnvironment(
+        [dot_brackets[index] for index in indices],
+        env_config,
+        get_sampler=get_sampler,
+        target_ids=[index + 1 for index in indices],
+    )
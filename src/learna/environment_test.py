@@ -1703,3 +1703,64 @@ def test_RnaDesignEnvironment_execute():
         assert states[index] == state
         assert 0 == reward
         assert False == terminal
+
+
+def test_RnaDesignEnvironment_execute_population():
+    solved_actions = [1, 0, 1, 3, 2, 1, 3]  # Actions correspond to valid solution
+    unsolved_actions = [2, 2, 2, 2, 2, 2, 2]
+    dot_brackets = ["(((....)))"]
+
+    environment_config = RnaDesignEnvironmentConfig(
+        use_conv=False, use_embedding=False, state_radius=0
+    )
+
+    environment = RnaDesignEnvironment(dot_brackets, environment_config)
+
+    first_state = environment.reset_population(3)
+    assert 3 == len(environment.population)
+    assert environment.reset() == first_state
+
+    environment.reset_population(3)
+    for index, actions in enumerate(
+        zip(unsolved_actions, solved_actions, unsolved_actions)
+    ):
+        state, terminal, rewards = environment.execute_population(actions)
+        if terminal:
+            assert None == state
+            assert 1.0 == rewards[1]
+            assert 1.0 > rewards[0]
+            assert rewards[0] == rewards[2]
+            break
+        assert [0, 0, 0] == rewards
+        assert False == terminal
+
+    # Test the best design is reported last
+    assert "CGCCUACGCG" == environment.design.primary
+    assert 3 == len(environment.episodes_info)
+    assert 0 == environment.episodes_info[-1].normalized_hamming_distance
+
+
+def test_RnaDesignEnvironment_episode_states():
+    actions = [1, 0, 1, 3, 2, 1, 3]
+    dot_brackets = ["(((....)))"]
+
+    environment_config = RnaDesignEnvironmentConfig(
+        use_conv=True, use_embedding=True, state_radius=1
+    )
+
+    environment = RnaDesignEnvironment(dot_brackets, environment_config)
+
+    states = [environment.reset()]
+    episode_states = environment.episode_states()
+    for action in actions:
+        state, terminal, _ = environment.execute(action)
+        if terminal:
+            break
+        states.append(state)
+
+    assert states == episode_states
+
+    # Test population keeps the target
+    target = environment.target
+    assert states[0] == environment.reset_population(2, keep_target=True)
+    assert target is environment.target
@@ -1,24 +1,40 @@
 import multiprocessing
+from functools import partial
 from pathlib import Path
 
 from .agent import NetworkConfig, get_network, AgentConfig, ppo_agent_kwargs, get_agent
 from .environment import RnaDesignEnvironment, RnaDesignEnvironmentConfig
+from .environment import get_shard_environment
+from .profiling import PhaseTimer, ChromeTracer, format_timings
+from .metrics import get_sink
+from .sampling import get_sampler_fn
+from .checkpointer import Checkpointer, latest_checkpoint, rolling_distance
 
 from ..tensorforce.threaded_runner import clone_worker_agent, ThreadedRunner
+from ..tensorforce.process_runner import ProcessRunner, SocketTransport
 
 
-def episode_finished(stats):
+def _get_episode_finished(sink, checkpointer=None):
     """
-    Function called after each episode of the agent (after designing an entire candidate solution).
+    Get the function called after each episode of the agent (after designing an entire
+    candidate solution).
 
     Args:
-       stats: Statistics to be printed.
+        sink: The metrics sink to write the statistics of each episode to.
+        checkpointer: Optional checkpointer to count the episode for.
 
     Returns:
-       True, meaning to continue running.
+        episode_finished: Inner function writing the statistics and returning True,
+            meaning to continue running.
     """
-    print(stats)
-    return True
+
+    def episode_finished(stats):
+        sink.write(stats)
+        if checkpointer:
+            checkpointer.episode_finished()
+        return True
+
+    return episode_finished
 
 
 def learn_to_design_rna(
@@ -30,6 +46,20 @@ def learn_to_design_rna(
     network_config,
     agent_config,
     env_config,
+    profile=False,
+    trace_path=None,
+    metrics_path=None,
+    metrics_format="jsonl",
+    metrics_sample_rate=1.0,
+    engine="threads",
+    address=None,
+    authkey=None,
+    checkpoint_episodes=None,
+    checkpoint_seconds=None,
+    keep_checkpoints=3,
+    resume=False,
+    target_sampler="uniform",
+    bucket_window=16,
 ):
     """
     Main function for training the agent for RNA design. Instanciate agents and environments
@@ -44,14 +74,68 @@ def learn_to_design_rna(
         network_config: The configuration of the network.
         agent_config: The configuration of the agent.
         env_config: The configuration of the environment.
+        profile: If set, measure the time spent per phase and print it at the end.
+        trace_path: If set, write a Chrome trace of all phases of all workers to this
+            file.
+        metrics_path: If set, write the statistics of each episode to this file
+            instead of printing them.
+        metrics_format: The format of the metrics file, jsonl or csv.
+        metrics_sample_rate: Fraction of the episodes to write or print.
+        engine: Either threads, sharing one model between threads, processes, with
+            local actor processes and a single learner, or distributed, waiting for
+            <worker_count> actors to connect to <address>. Each actor designs its own
+            shard of the targets. Actor processes can not be started from daemonic
+            processes, e.g. of a multiprocessing.Pool.
+        address: The (host, port) the learner listens on with the distributed engine.
+        authkey: The authentication key actors have to present to the learner.
+        checkpoint_episodes: If set, checkpoint the model to <save_path>/checkpoints
+            every this many episodes, on a background thread.
+        checkpoint_seconds: If set, checkpoint the model every this many seconds.
+        keep_checkpoints: The number of most recent checkpoints to keep, in addition
+            to the one with the lowest rolling distance.
+        resume: If set, restore the latest checkpoint in <save_path>/checkpoints
+            instead of <restore_path>, if there is one.
+        target_sampler: How to choose the target of each episode, uniform, length
+            to draw consecutive episodes from targets of similar length, or priority to
+            prefer targets with high recent distance. The threads share one
+            sampler, actor processes each keep their own priorities and buckets.
+        bucket_window: The number of consecutive episodes per length bucket of the
+            length sampler.
 
     Returns:
         Information on the episodes.
     """
     env_config.use_conv = any(map(lambda x: x > 1, network_config.conv_sizes))
     env_config.use_embedding = bool(network_config.embedding_size)
+    if engine not in ("threads", "processes", "distributed"):
+        raise ValueError(f"Unknown engine {engine}")
+    if engine != "threads" and (profile or trace_path):
+        raise ValueError("Profiling and tracing require the threads engine")
+    if engine == "distributed" and not authkey:
+        raise ValueError("The distributed engine requires an authkey")
+    checkpoint_path = Path(save_path, "checkpoints") if save_path else None
+    if (checkpoint_episodes or checkpoint_seconds or resume) and not save_path:
+        raise ValueError("Checkpointing requires a save_path")
+    if resume and latest_checkpoint(checkpoint_path):
+        restore_path = latest_checkpoint(checkpoint_path)
+
+    sampler_kwargs = {}
+    if target_sampler == "length":
+        sampler_kwargs = dict(window=bucket_window, weighting="frequency", seed=0)
+    # Threads share the sampler, actor processes each build their own
+    get_sampler = get_sampler_fn(
+        target_sampler, shared=engine == "threads", **sampler_kwargs
+    )
+    tracer = ChromeTracer(trace_path) if trace_path else None
+    timers = [
+        PhaseTimer(enabled=profile or bool(trace_path), tracer=tracer)
+        for _ in range(worker_count)
+    ]
     environments = [
-        RnaDesignEnvironment(dot_brackets, env_config) for _ in range(worker_count)
+        RnaDesignEnvironment(
+            dot_brackets, env_config, timer=timer, get_sampler=get_sampler
+        )
+        for timer in timers
     ]
 
     network = get_network(network_config)
@@ -62,25 +146,73 @@ def learn_to_design_rna(
         session_config=None,
         restore_path=restore_path,
     )
-    agents = clone_worker_agent(
-        agent,
-        worker_count,
-        environments[0],
-        network,
-        ppo_agent_kwargs(agent_config, session_config=None),
-    )
-    threaded_runner = ThreadedRunner(agents, environments)
-    # Bug in threaded runner requires a summary report
-    threaded_runner.run(
-        timeout=timeout, episode_finished=episode_finished, summary_report=lambda x: x
-    )
+    sink_kwargs = dict(sample_rate=metrics_sample_rate)
+    if metrics_path is None:
+        sink_kwargs.update(format_record=str)  # Print the statistics as dictionary
+    sink = get_sink(metrics_path, metrics_format, **sink_kwargs)
+
+    if engine != "threads":
+        # Actors receive the (restored) weights of the learner before acting
+        get_actor_agent = partial(
+            get_agent,
+            network=network,
+            agent_config=agent_config,
+            session_config=None,
+            restore_path=None,
+        )
+        runner = ProcessRunner(
+            agent,
+            get_actor_agent,
+            partial(get_shard_environment, dot_brackets, env_config, get_sampler),
+            worker_count,
+            SocketTransport(address, authkey) if engine == "distributed" else None,
+        )
+
+        def get_episodes_infos():
+            return getattr(runner, "episodes_info", [])
+
+    else:
+        agents = clone_worker_agent(
+            agent,
+            worker_count,
+            environments[0],
+            network,
+            ppo_agent_kwargs(agent_config, session_config=None),
+        )
+        runner = ThreadedRunner(agents, environments, timers=timers)
+
+        def get_episodes_infos():
+            return [environment.episodes_info for environment in environments]
+
+    checkpointer = None
+    if checkpoint_episodes or checkpoint_seconds:
+        checkpointer = Checkpointer(
+            agent,
+            checkpoint_path,
+            lambda: rolling_distance(get_episodes_infos(), window=100),
+            keep_last=keep_checkpoints,
+            every_episodes=checkpoint_episodes,
+            every_seconds=checkpoint_seconds,
+        ).start()
+    episode_finished = _get_episode_finished(sink, checkpointer)
+
+    try:
+        runner.run(timeout=timeout, episode_finished=episode_finished)
+    finally:
+        if checkpointer:
+            checkpointer.stop()
+        sink.close()
+    episodes_infos = get_episodes_infos()
+    if profile:
+        print(format_timings(runner.get_timings()))
+    if trace_path:
+        tracer.close()
 
     if save_path:
         save_path = Path(save_path)
         save_path.mkdir(parents=True, exist_ok=True)
         agent.save_model(directory=save_path.joinpath("last_model"))
 
-    episodes_infos = [environment.episodes_info for environment in environments]
     return episodes_infos
 
 
@@ -104,10 +236,74 @@ if __name__ == "__main__":
     # Model
     parser.add_argument("--restore_path", type=Path, help="From where to load model")
     parser.add_argument("--save_path", type=Path, help="Where to save models")
+    parser.add_argument(
+        "--checkpoint_episodes", type=int, help="Episodes between checkpoints"
+    )
+    parser.add_argument(
+        "--checkpoint_seconds", type=int, help="Seconds between checkpoints"
+    )
+    parser.add_argument(
+        "--keep_checkpoints",
+        default=3,
+        type=int,
+        help="Number of recent checkpoints to keep besides the best",
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="Resume from the latest checkpoint"
+    )
+    parser.add_argument(
+        "--target_sampler",
+        default="uniform",
+        choices=["uniform", "length", "priority"],
+        help="How to choose the target of each episode",
+    )
+    parser.add_argument(
+        "--bucket_window",
+        default=16,
+        type=int,
+        help="Number of consecutive episodes per length bucket of the length sampler",
+    )
 
     # Exectuion behaviour
     parser.add_argument("--timeout", type=int, help="Maximum time to run")
     parser.add_argument("--worker_count", type=int, help="Number of threads to use")
+    parser.add_argument(
+        "--engine",
+        default="threads",
+        choices=["threads", "processes", "distributed"],
+        help="Run the workers as threads, local actor processes or remote actors",
+    )
+    parser.add_argument(
+        "--address",
+        default="localhost:6000",
+        help="The <host>:<port> to wait for remote actors on",
+    )
+    parser.add_argument(
+        "--authkey",
+        help="The key remote actors have to present, required by the distributed "
+        "engine",
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="Print the time spent per phase"
+    )
+    parser.add_argument(
+        "--trace_path", type=Path, help="Where to write a Chrome trace of all phases"
+    )
+    parser.add_argument(
+        "--metrics_path", type=Path, help="Where to write episode statistics to"
+    )
+    parser.add_argument(
+        "--metrics_format",
+        default="jsonl",
+        choices=["jsonl", "csv"],
+        help="Format of the episode statistics file",
+    )
+    parser.add_argument(
+        "--metrics_sample_rate",
+        default=1.0,
+        type=float,
+        help="Fraction of episode statistics to write",
+    )
 
     # Hyperparameters
     parser.add_argument("--learning_rate", type=float, help="Learning rate to use")
@@ -151,6 +347,8 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+    if args.engine == "distributed" and not args.authkey:
+        parser.error("--engine distributed requires --authkey")
 
     network_config = NetworkConfig(
         conv_sizes=args.conv_sizes,
@@ -172,6 +370,7 @@ if __name__ == "__main__":
         data_dir=args.data_dir,
         target_structure_ids=args.target_structure_ids,
     )
+    host, port = args.address.rsplit(":", 1)
     learn_to_design_rna(
         dot_brackets,
         timeout=args.timeout,
@@ -181,4 +380,18 @@ if __name__ == "__main__":
         network_config=network_config,
         agent_config=agent_config,
         env_config=env_config,
+        profile=args.profile,
+        trace_path=args.trace_path,
+        metrics_path=args.metrics_path,
+        metrics_format=args.metrics_format,
+        metrics_sample_rate=args.metrics_sample_rate,
+        engine=args.engine,
+        address=(host, int(port)),
+        authkey=args.authkey.encode() if args.authkey else None,
+        checkpoint_episodes=args.checkpoint_episodes,
+        checkpoint_seconds=args.checkpoint_seconds,
+        keep_checkpoints=args.keep_checkpoints,
+        resume=args.resume,
+        target_sampler=args.target_sampler,
+        bucket_window=args.bucket_window,
     )
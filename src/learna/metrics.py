@@ -0,0 +1,166 @@
+import abc
+import csv
+import json
+import sys
+import threading
+import time
+
+
+class _BufferedSink(abc.ABC):
+    """
+    Base class for sinks of per-episode records, keeping a fraction of the records
+    and writing them in batches. Safe to share between threads.
+    """
+
+    def __init__(self, sample_rate=1.0, buffer_size=100, flush_interval=1.0):
+        """
+        Initialize the sink.
+
+        Args:
+            sample_rate: Fraction of the records to keep, spread evenly.
+            buffer_size: Number of records to collect before writing them.
+            flush_interval: Maximum time in seconds a record waits in the buffer,
+                checked whenever a record is written.
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"Sample rate {sample_rate} not in (0, 1]")
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._credit = 0.0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+
+    def write(self, record, force=False):
+        """
+        Add a record, unless it is skipped by sampling.
+
+        Args:
+            record: Dictionary from field names to values.
+            force: If set, keep the record regardless of the sample rate and write
+                the buffer at once, e.g. for solved episodes.
+        """
+        with self._lock:
+            self._credit += self.sample_rate
+            if self._credit < 1 and not force:
+                return
+            self._credit = max(self._credit - 1, 0.0)
+            self._buffer.append(record)
+            if (
+                force
+                or len(self._buffer) >= self.buffer_size
+                or time.time() - self._last_flush >= self.flush_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+        self._last_flush = time.time()
+
+    @abc.abstractmethod
+    def _write(self, records):
+        """
+        Write a batch of records.
+        """
+
+    def close(self):
+        self.flush()
+
+
+class PrintSink(_BufferedSink):
+    """
+    Write records to stdout, by default as their space separated values.
+    """
+
+    def __init__(self, format_record=None, stream=None, **kwargs):
+        """
+        Initialize the sink.
+
+        Args:
+            format_record: Optional function formatting a record as a line.
+            stream: The stream to write to, stdout by default.
+            **kwargs: See _BufferedSink.
+        """
+        super().__init__(**kwargs)
+        self._format_record = format_record or (
+            lambda record: " ".join(map(str, record.values()))
+        )
+        self._stream = stream or sys.stdout
+
+    def _write(self, records):
+        self._stream.write("".join(f"{self._format_record(r)}\n" for r in records))
+        self._stream.flush()
+
+
+class JsonlSink(_BufferedSink):
+    """
+    Append records to a file, one JSON object per line.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self._file = open(path, "a")
+
+    def _write(self, records):
+        self._file.write(
+            "".join(json.dumps(record, default=str) + "\n" for record in records)
+        )
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class CsvSink(_BufferedSink):
+    """
+    Append records to a CSV file. The columns are the fields of the first record,
+    written as header if the file is empty.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self._file = open(path, "a", newline="")
+        self._writer = None
+
+    def _write(self, records):
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=list(records[0]), extrasaction="ignore"
+            )
+            if self._file.tell() == 0:
+                self._writer.writeheader()
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+def get_sink(path=None, metrics_format="jsonl", **kwargs):
+    """
+    Get a metrics sink.
+
+    Args:
+        path: The file to write to. If not set, records are printed.
+        metrics_format: Either jsonl or csv, if <path> is set.
+        **kwargs: Arguments of the sink, e.g. sample_rate.
+
+    Returns:
+        The sink.
+    """
+    if path is None:
+        return PrintSink(**kwargs)
+    if metrics_format == "jsonl":
+        return JsonlSink(path, **kwargs)
+    if metrics_format == "csv":
+        return CsvSink(path, **kwargs)
+    raise ValueError(f"Unknown metrics format {metrics_format}")
@@ -0,0 +1,46 @@
+"""
+    Testsuite for the metrics sinks.
+"""
+
+import io
+import json
+
+from .metrics import PrintSink
+from .metrics import get_sink
+
+
+def test_PrintSink():
+    stream = io.StringIO()
+    sink = PrintSink(stream=stream, sample_rate=0.25, buffer_size=2, flush_interval=60)
+
+    # Test sampling and buffering
+    for episode in range(7):
+        sink.write(dict(episode=episode, reward=0.5))
+    assert "" == stream.getvalue()
+    sink.write(dict(episode=7, reward=0.5))
+    assert "3 0.5\n7 0.5\n" == stream.getvalue()
+    sink.write(dict(episode=8, reward=1.0), force=True)
+    assert ["3 0.5", "7 0.5", "8 1.0"] == stream.getvalue().splitlines()
+    sink.write(dict(episode=9, reward=0.5), force=True)
+    sink.close()
+    assert "9 0.5" == stream.getvalue().splitlines()[-1]
+
+
+def test_get_sink(tmp_path):
+    records = [dict(elapsed_time=0.5, reward=0.25, candidate="GC")] * 3
+
+    path = tmp_path.joinpath("metrics.jsonl")
+    sink = get_sink(path, "jsonl")
+    for record in records:
+        sink.write(record)
+    sink.close()
+    assert records == [json.loads(line) for line in path.read_text().splitlines()]
+
+    # Test header is only written to empty files
+    path = tmp_path.joinpath("metrics.csv")
+    for _ in range(2):
+        sink = get_sink(path, "csv")
+        sink.write(records[0])
+        sink.close()
+    lines = path.read_text().splitlines()
+    assert ["elapsed_time,reward,candidate", "0.5,0.25,GC", "0.5,0.25,GC"] == lines
@@ -0,0 +1,398 @@
+import json
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from .agent import get_network
+from .policy import _softmax, sample_action
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+_ACTIVATIONS = {
+    "none": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "elu": lambda x: np.where(x > 0.0, x, np.expm1(np.minimum(x, 0.0))),
+    "softplus": lambda x: np.logaddexp(x, 0.0),
+}
+
+# Layer types of get_network which hold variables. Tensorforce scopes each layer by
+# its type and the count of earlier layers of that type, e.g. dense0 or conv1d1.
+_VARIABLE_LAYERS = ("embedding", "conv1d", "internal_lstm", "dense")
+_LAYER_SCOPE = re.compile(r"^(%s)(\d+)$" % "|".join(_VARIABLE_LAYERS))
+_OPTIMIZER_VARIABLES = re.compile(r"Adam|beta\d_power")
+_LOGITS_SCOPE = re.compile(r"(^|/)[^/]*logits[^/]*/")
+
+
+def _conv1d(x, weights, bias):
+    """
+    One dimensional convolution with VALID padding and stride 1.
+
+    Args:
+        x: Input of shape (length, in_channels).
+        weights: Filters of shape (window, in_channels, out_channels).
+        bias: Bias of shape (out_channels,).
+
+    Returns:
+        Output of shape (length - window + 1, out_channels).
+    """
+    length, in_channels = x.shape
+    window = len(weights)
+    windows = np.lib.stride_tricks.as_strided(
+        x,
+        shape=(length - window + 1, window, in_channels),
+        strides=(x.strides[0], x.strides[0], x.strides[1]),
+        writeable=False,
+    )
+    return np.einsum("twc,wco->to", windows, weights) + bias
+
+
+def _lstm_step(x, state, kernel, bias, forget_bias=1.0):
+    """
+    One step of the tensorflow LSTMCell built by tensorforce's internal_lstm layer,
+    with its defaults: gate order i, j, f, o and a forget bias of 1.
+
+    Args:
+        x: Input of shape (input_size,).
+        state: Array of shape (2, units) holding the cell and the hidden state.
+        kernel: Weights of shape (input_size + units, 4 * units).
+        bias: Bias of shape (4 * units,).
+        forget_bias: Bias added to the forget gate.
+
+    Returns:
+        The output and the next state.
+    """
+    c, h = state
+    i, j, f, o = np.split(np.concatenate([x, h]) @ kernel + bias, 4)
+    c = c * _sigmoid(f + forget_bias) + _sigmoid(i) * np.tanh(j)
+    h = np.tanh(c) * _sigmoid(o)
+    return h, np.stack([c, h])
+
+
+def _group_checkpoint_variables(variables):
+    """
+    Group checkpoint variables by the network layer they belong to.
+
+    Args:
+        variables: Dictionary from variable names to values.
+
+    Returns:
+        Dictionary from (layer type, layer index) to the layer's variables, and
+        the variables outside of any layer.
+    """
+    layers = defaultdict(dict)
+    other = {}
+    for name, value in variables.items():
+        if _OPTIMIZER_VARIABLES.search(name) or np.ndim(value) == 0:
+            continue
+        for scope in name.split("/"):
+            match = _LAYER_SCOPE.match(scope)
+            if match:
+                layer_type, index = match.groups()
+                layers[(layer_type, int(index))][name] = value
+                break
+        else:
+            other[name] = value
+    return layers, other
+
+
+def _weights_and_bias(variables):
+    """
+    Split the variables of a layer into weights and bias.
+    """
+    weights = [value for value in variables.values() if np.ndim(value) > 1]
+    bias = [value for value in variables.values() if np.ndim(value) == 1]
+    if len(weights) != 1 or len(bias) > 1:
+        raise ValueError(f"Unexpected layer variables {sorted(variables)}")
+    return weights[0], bias[0] if bias else None
+
+
+def _logits_layer(variables, num_actions):
+    """
+    Find the output layer of the action distribution among non-network variables,
+    by the logits scope of tensorforce's categorical distribution.
+    """
+    layer = {
+        name: value for name, value in variables.items() if _LOGITS_SCOPE.search(name)
+    }
+    if not layer:
+        raise ValueError(f"Could not identify the logits among {sorted(variables)}")
+    weights, bias = _weights_and_bias(layer)
+    if weights.shape[-1] != num_actions:
+        raise ValueError(f"Logits of shape {weights.shape} for {num_actions} actions")
+    return weights, bias if bias is not None else np.zeros(num_actions)
+
+
+def export_policy(restore_path, network_config, output_path, num_actions=4):
+    """
+    Export the policy weights of a saved agent to a numpy archive.
+
+    Args:
+        restore_path: Directory of the saved tensorforce model.
+        network_config: The configuration of the network the model was trained with.
+        output_path: The path of the .npz file to write.
+        num_actions: The number of actions of the policy.
+    """
+    # Only exporting needs tensorflow, inference does not
+    import tensorflow as tf
+
+    reader = tf.train.NewCheckpointReader(tf.train.latest_checkpoint(str(restore_path)))
+    variables = {
+        name: reader.get_tensor(name) for name in reader.get_variable_to_shape_map()
+    }
+    layers, other = _group_checkpoint_variables(variables)
+
+    network = get_network(network_config)
+    arrays = {}
+    layer_counts = defaultdict(int)
+    for index, layer in enumerate(network):
+        if layer["type"] not in _VARIABLE_LAYERS:
+            continue
+        key = (layer["type"], layer_counts[layer["type"]])
+        layer_counts[layer["type"]] += 1
+        weights, bias = _weights_and_bias(layers.pop(key))
+        arrays[f"{index}/weights"] = weights
+        if bias is not None:
+            arrays[f"{index}/bias"] = bias
+    if layers:
+        raise ValueError(f"Checkpoint has layers not in the network: {sorted(layers)}")
+
+    arrays["logits/weights"], arrays["logits/bias"] = _logits_layer(other, num_actions)
+    np.savez(output_path, network=json.dumps(network), **arrays)
+
+
+class NumpyPolicy(object):
+    """
+    Forward pass of a policy network built by get_network, implemented in numpy.
+    """
+
+    def __init__(self, network, arrays):
+        """
+        Initialize the policy.
+
+        Args:
+            network: The layer specifications as returned by get_network.
+            arrays: Dictionary of layer weights as written by export_policy.
+        """
+        self.network = network
+        self._arrays = arrays
+        self._lstm_layers = [
+            index
+            for index, layer in enumerate(network)
+            if layer["type"] == "internal_lstm"
+        ]
+        # Layers before the flatten act on every site and can be shared between
+        # overlapping states, the remaining layers act on a single state.
+        types = [layer["type"] for layer in network]
+        split = types.index("flatten") if "flatten" in types else 0
+        self._site_layers = list(enumerate(network))[:split]
+        self._state_layers = list(enumerate(network))[split:]
+        self._receptive_shrinkage = sum(
+            layer["window"] - 1 for layer in network if layer["type"] == "conv1d"
+        )
+        self.reset()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a policy written by export_policy.
+
+        Args:
+            path: Path of the .npz file.
+
+        Returns:
+            The policy.
+        """
+        with np.load(path) as archive:
+            network = json.loads(str(archive["network"]))
+            arrays = {
+                name: archive[name] for name in archive.files if name != "network"
+            }
+        return cls(network, arrays)
+
+    @property
+    def recurrent(self):
+        return bool(self._lstm_layers)
+
+    def reset(self):
+        """
+        Reset the internal state of recurrent layers, done at the start of an episode.
+        """
+        self._internals = {
+            index: np.zeros((2, self.network[index]["size"]))
+            for index in self._lstm_layers
+        }
+
+    def _apply_layers(self, x, layers):
+        for index, layer in layers:
+            weights = self._arrays.get(f"{index}/weights")
+            bias = self._arrays.get(f"{index}/bias")
+            if layer["type"] == "embedding":
+                x = weights[x]
+            elif layer["type"] == "conv1d":
+                x = _ACTIVATIONS[layer["activation"]](_conv1d(x, weights, bias))
+            elif layer["type"] == "flatten":
+                x = x.reshape(-1)
+            elif layer["type"] == "internal_lstm":
+                x, self._internals[index] = _lstm_step(
+                    x, self._internals[index], weights, bias
+                )
+            elif layer["type"] == "dense":
+                x = _ACTIVATIONS[layer["activation"]](x @ weights + bias)
+            else:
+                raise ValueError(f"Unsupported layer type {layer['type']}")
+        return x
+
+    def _logits(self, x):
+        return x @ self._arrays["logits/weights"] + self._arrays["logits/bias"]
+
+    def probabilities(self, state):
+        """
+        Compute the action distribution for a single state. Advances the internal
+        state of recurrent layers.
+
+        Args:
+            state: The state as returned by the environment.
+
+        Returns:
+            Array with the probability of each action.
+        """
+        x = self._apply_layers(np.asarray(state), enumerate(self.network))
+        return _softmax(self._logits(x))
+
+    def act(self, state, deterministic=False):
+        return sample_action(self.probabilities(state), deterministic)
+
+    def feature_map(self, padded_encoding):
+        """
+        Apply the per-site layers (embedding and convolutions) once to an entire
+        padded target instead of to every state window separately.
+
+        Args:
+            padded_encoding: The padded encoding of the target structure.
+
+        Returns:
+            Array with one feature column per valid convolution position.
+        """
+        return self._apply_layers(np.asarray(padded_encoding), self._site_layers)
+
+    def probabilities_at(self, feature_map, site, state_size):
+        """
+        Compute the action distribution for the state starting at <site> from a
+        feature map. Equivalent to probabilities() on that state.
+
+        Args:
+            feature_map: The feature map of the target as returned by feature_map().
+            site: The first site of the state in the padded target.
+            state_size: The number of sites of a state.
+
+        Returns:
+            Array with the probability of each action.
+        """
+        columns = state_size - self._receptive_shrinkage
+        x = self._apply_layers(feature_map[site : site + columns], self._state_layers)
+        return _softmax(self._logits(x))
+
+
+class NumpyAgent(object):
+    """
+    Minimal stand-in for a frozen tensorforce agent, acting with a NumpyPolicy.
+    """
+
+    def __init__(self, policy, environment=None):
+        """
+        Initialize the agent.
+
+        Args:
+            policy: The NumpyPolicy to act with.
+            environment: If given, ignore the states passed to act() and evaluate the
+                policy on a feature map shared by all states of the current target.
+        """
+        self.policy = policy
+        self.episode = 0
+        self.timestep = 0
+        self._environment = environment
+        self._target = None
+        self._feature_map = None
+
+    def reset(self):
+        self.policy.reset()
+
+    def act(self, states, deterministic=False):
+        self.timestep += 1
+        if self._environment is None:
+            return self.policy.act(states, deterministic)
+
+        target = self._environment.target
+        if target is not self._target:
+            self._target = target
+            self._feature_map = self.policy.feature_map(target.padded_encoding)
+        probabilities = self.policy.probabilities_at(
+            self._feature_map,
+            self._environment.design.first_unassigned_site,
+            self._environment.states["shape"][0],
+        )
+        return sample_action(probabilities, deterministic)
+
+    def observe(self, terminal, reward):
+        raise RuntimeError("NumpyAgent does not support weight updates")
+
+    def should_stop(self):
+        return False
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from .agent import NetworkConfig
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--restore_path", type=Path, required=True, help="From where to load model"
+    )
+    parser.add_argument(
+        "--output_path", type=Path, required=True, help="Where to write the .npz file"
+    )
+
+    # Network
+    parser.add_argument(
+        "--conv_sizes", type=int, default=[1], nargs="+", help="Size of conv kernels"
+    )
+    parser.add_argument(
+        "--conv_channels",
+        type=int,
+        default=[50],
+        nargs="+",
+        help="Channel size of conv",
+    )
+    parser.add_argument(
+        "--num_fc_layers", type=int, default=2, help="Number of FC layers to use"
+    )
+    parser.add_argument(
+        "--fc_units", type=int, default=50, help="Number of units to use per FC layer"
+    )
+    parser.add_argument("--lstm_units", type=int, help="The number of lstm units")
+    parser.add_argument("--num_lstm_layers", type=int, help="The number of lstm layers")
+    parser.add_argument("--embedding_size", type=int, help="The size of the embedding")
+
+    args = parser.parse_args()
+
+    network_config = NetworkConfig(
+        conv_sizes=args.conv_sizes,
+        conv_channels=args.conv_channels,
+        num_fc_layers=args.num_fc_layers,
+        fc_units=args.fc_units,
+        lstm_units=args.lstm_units,
+        num_lstm_layers=args.num_lstm_layers,
+        embedding_size=args.embedding_size,
+    )
+    export_policy(args.restore_path, network_config, args.output_path)
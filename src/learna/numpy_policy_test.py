@@ -0,0 +1,310 @@
+"""
+    Testsuite for the numpy inference engine.
+"""
+
+import json
+
+import pytest
+import numpy as np
+import numpy.testing as nt
+
+from .agent import NetworkConfig, AgentConfig, get_network
+from .environment import RnaDesignEnvironmentConfig
+from .environment import _Target
+from .numpy_policy import _conv1d
+from .numpy_policy import _group_checkpoint_variables
+from .numpy_policy import _logits_layer
+from .numpy_policy import export_policy
+from .numpy_policy import NumpyPolicy
+from .design_rna import design_rna
+
+
+def _random_arrays(network, length, input_size, num_actions=4):
+    rng = np.random.RandomState(0)
+    arrays = {}
+    for index, layer in enumerate(network):
+        if layer["type"] == "embedding":
+            arrays[f"{index}/weights"] = rng.randn(layer["indices"], layer["size"])
+            input_size = layer["size"]
+        elif layer["type"] == "conv1d":
+            shape = (layer["window"], input_size, layer["size"])
+            arrays[f"{index}/weights"] = rng.randn(*shape)
+            arrays[f"{index}/bias"] = rng.randn(layer["size"])
+            input_size = layer["size"]
+            length -= layer["window"] - 1
+        elif layer["type"] == "flatten":
+            input_size *= length
+        elif layer["type"] == "internal_lstm":
+            shape = (input_size + layer["size"], 4 * layer["size"])
+            arrays[f"{index}/weights"] = rng.randn(*shape)
+            arrays[f"{index}/bias"] = rng.randn(4 * layer["size"])
+            input_size = layer["size"]
+        elif layer["type"] == "dense":
+            arrays[f"{index}/weights"] = rng.randn(input_size, layer["size"])
+            arrays[f"{index}/bias"] = rng.randn(layer["size"])
+            input_size = layer["size"]
+    arrays["logits/weights"] = rng.randn(input_size, num_actions)
+    arrays["logits/bias"] = rng.randn(num_actions)
+    return arrays
+
+
+def test_conv1d():
+    x = np.arange(12.0).reshape(6, 2)
+    weights = np.arange(18.0).reshape(3, 2, 3)
+    bias = np.array([1.0, 2.0, 3.0])
+
+    expected = np.array(
+        [sum(x[t + w] @ weights[w] for w in range(3)) + bias for t in range(len(x) - 2)]
+    )
+    nt.assert_allclose(expected, _conv1d(x, weights, bias))
+
+
+def _layer_keys(network):
+    counts = {}
+    keys = set()
+    for layer in network:
+        if layer["type"] in ("embedding", "conv1d", "internal_lstm", "dense"):
+            keys.add((layer["type"], counts.setdefault(layer["type"], 0)))
+            counts[layer["type"]] += 1
+    return keys
+
+
+def test_group_checkpoint_variables():
+    network_config = NetworkConfig(
+        conv_sizes=[3, 5], conv_channels=[4, 2], embedding_size=2, num_fc_layers=2
+    )
+    network = get_network(network_config)
+    # Variable names as tensorforce scopes them, layer type and count per type
+    scope = "ppo/actions-and-internals/layered-network"
+    variables = {
+        f"{scope}/embedding0/embeddings": np.zeros((4, 2)),
+        f"{scope}/conv1d0/W": np.zeros((3, 2, 4)),
+        f"{scope}/conv1d0/b": np.zeros(4),
+        f"{scope}/conv1d1/W": np.zeros((5, 4, 2)),
+        f"{scope}/conv1d1/b": np.zeros(2),
+        f"{scope}/dense0/linear/W": np.zeros((2, 50)),
+        f"{scope}/dense0/linear/b": np.zeros(50),
+        f"{scope}/dense1/linear/W": np.zeros((50, 50)),
+        f"{scope}/dense1/linear/b": np.zeros(50),
+        f"{scope}/dense0/linear/W/Adam": np.zeros((2, 50)),
+        "ppo/actions-and-internals/categorical/action-logits/W": np.zeros((50, 4)),
+        "ppo/timestep": np.zeros(()),
+    }
+
+    layers, other = _group_checkpoint_variables(variables)
+    assert _layer_keys(network) == set(layers)
+    assert {f"{scope}/conv1d1/W", f"{scope}/conv1d1/b"} == set(layers[("conv1d", 1)])
+    assert ["ppo/actions-and-internals/categorical/action-logits/W"] == list(other)
+
+
+def test_group_checkpoint_variables_tensorforce():
+    pytest.importorskip("tensorforce")
+    from .agent import get_agent
+    from .environment import RnaDesignEnvironment
+    from ..tensorforce.runner import get_variable_values
+
+    network_config = NetworkConfig(
+        conv_sizes=[3, 5], conv_channels=[4, 2], embedding_size=2, num_fc_layers=2
+    )
+    network = get_network(network_config)
+    env_config = RnaDesignEnvironmentConfig(state_radius=4, use_embedding=True)
+    agent = get_agent(
+        environment=RnaDesignEnvironment(["((...))"], env_config),
+        network=network,
+        agent_config=AgentConfig(),
+        session_config=None,
+        restore_path=None,
+    )
+    # Checkpoints name variables without the output index
+    variables = {
+        name.split(":")[0]: value
+        for name, value in get_variable_values(agent, "trainable_variables").items()
+    }
+    agent.close()
+
+    layers, _ = _group_checkpoint_variables(variables)
+    assert _layer_keys(network) == set(layers)
+
+
+def test_logits_layer():
+    scope = "ppo/actions-and-internals/categorical"
+    variables = {
+        f"{scope}/action-logits/W": np.ones((50, 4)),
+        f"{scope}/action-logits/b": np.ones(4),
+        "ppo/baseline/W": np.zeros((50, 4)),
+    }
+    # Matched by scope, not by shape
+    weights, bias = _logits_layer(variables, num_actions=4)
+    nt.assert_equal(np.ones((50, 4)), weights)
+    nt.assert_equal(np.ones(4), bias)
+    with pytest.raises(ValueError):
+        _logits_layer(variables, num_actions=3)
+    with pytest.raises(ValueError):
+        _logits_layer({"ppo/baseline/W": np.zeros((50, 4))}, num_actions=4)
+
+
+def test_export_policy_tensorforce(tmp_path):
+    pytest.importorskip("tensorforce")
+    from .agent import get_agent
+    from .environment import RnaDesignEnvironment
+    from .policy import TensorforcePolicy
+
+    network_config = NetworkConfig(
+        conv_sizes=[3, 0],
+        conv_channels=[4, 1],
+        embedding_size=2,
+        num_fc_layers=1,
+        fc_units=5,
+        num_lstm_layers=1,
+        lstm_units=3,
+    )
+    env_config = RnaDesignEnvironmentConfig(state_radius=2, use_embedding=True)
+    agent = get_agent(
+        environment=RnaDesignEnvironment(["((...))"], env_config),
+        network=get_network(network_config),
+        agent_config=AgentConfig(),
+        session_config=None,
+        restore_path=None,
+    )
+    agent.save_model(directory=str(tmp_path.joinpath("model")))
+    path = tmp_path.joinpath("policy.npz")
+    export_policy(tmp_path, network_config, path)
+
+    # Same checkpoint and states, same distributions, including the recurrent state
+    policy = NumpyPolicy.load(path)
+    reference = TensorforcePolicy(agent)
+    states = [[3, 3, 1, 1, 1], [3, 1, 1, 1, 0], [1, 1, 1, 0, 0], [1, 1, 0, 0, 0]]
+    for state in states:
+        nt.assert_allclose(
+            reference.probabilities(state), policy.probabilities(state), rtol=1e-5
+        )
+    agent.close()
+
+
+def test_NumpyPolicy():
+    network_config = NetworkConfig(
+        conv_sizes=[3, 0],
+        conv_channels=[4, 1],
+        embedding_size=2,
+        num_fc_layers=1,
+        fc_units=5,
+        num_lstm_layers=1,
+        lstm_units=3,
+    )
+    network = get_network(network_config)
+    arrays = _random_arrays(network, length=5, input_size=None)
+    policy = NumpyPolicy(network, arrays)
+    state = [3, 3, 0, 1, 2]
+
+    # Test general behaviour
+    probabilities = policy.probabilities(state)
+    assert (4,) == probabilities.shape
+    nt.assert_almost_equal(1.0, probabilities.sum())
+    assert policy.recurrent
+
+    # Test recurrent state is carried and reset
+    nt.assert_raises(
+        AssertionError,
+        nt.assert_allclose,
+        probabilities,
+        policy.probabilities(state),
+    )
+    policy.reset()
+    nt.assert_allclose(probabilities, policy.probabilities(state))
+
+    # Test sampled actions are valid
+    assert policy.act(state) in range(4)
+
+
+def test_NumpyPolicy_load(tmp_path):
+    network = get_network(NetworkConfig(conv_sizes=[0, 0], fc_units=3))
+    arrays = _random_arrays(network, length=None, input_size=3)
+    path = tmp_path.joinpath("policy.npz")
+    np.savez(path, network=json.dumps(network), **arrays)
+
+    policy = NumpyPolicy.load(path)
+    assert network == policy.network
+    assert not policy.recurrent
+    assert (4,) == policy.probabilities([0.0, 1.0, 0.0]).shape
+
+
+@pytest.mark.parametrize(
+    "shared_feature_map, population_size, beam_width",
+    [(False, 1, None), (True, 1, None), (False, 4, None), (False, 1, 8)],
+)
+def test_design_rna_numpy_policy(
+    tmp_path, shared_feature_map, population_size, beam_width
+):
+    network_config = NetworkConfig(conv_sizes=[3, 0], conv_channels=[2, 1], fc_units=4)
+    network = get_network(network_config)
+    path = tmp_path.joinpath("policy.npz")
+    np.savez(path, network=json.dumps(network), **_random_arrays(network, 3, 1))
+
+    episodes_info = design_rna(
+        ["((...))"],
+        timeout=1,
+        restore_path=None,
+        stop_learning=True,
+        restart_timeout=None,
+        network_config=network_config,
+        agent_config=AgentConfig(),
+        env_config=RnaDesignEnvironmentConfig(state_radius=1),
+        numpy_policy_path=path,
+        shared_feature_map=shared_feature_map,
+        population_size=population_size,
+        beam_width=beam_width,
+    )
+    assert episodes_info
+
+
+def test_NumpyPolicy_probabilities_at():
+    network_config = NetworkConfig(
+        conv_sizes=[3, 5],
+        conv_channels=[4, 2],
+        embedding_size=2,
+        num_fc_layers=1,
+        fc_units=5,
+    )
+    network = get_network(network_config)
+    policy = NumpyPolicy(network, _random_arrays(network, length=9, input_size=None))
+    env_config = RnaDesignEnvironmentConfig(state_radius=4, use_embedding=True)
+    target = _Target("((..((...))..))", env_config)
+
+    feature_map = policy.feature_map(target.padded_encoding)
+    for site in range(len(target)):
+        state = target.padded_encoding[site : site + 9]
+        nt.assert_allclose(
+            policy.probabilities(state), policy.probabilities_at(feature_map, site, 9)
+        )
+
+    # Test networks without per-site layers
+    network = get_network(NetworkConfig(conv_sizes=[0, 0], fc_units=3))
+    policy = NumpyPolicy(network, _random_arrays(network, length=None, input_size=9))
+    env_config = RnaDesignEnvironmentConfig(state_radius=4, use_conv=False)
+    target = _Target("((..((...))..))", env_config)
+
+    feature_map = policy.feature_map(target.padded_encoding)
+    state = target.padded_encoding[3:12]
+    nt.assert_allclose(
+        policy.probabilities(state), policy.probabilities_at(feature_map, 3, 9)
+    )
+
+
+@pytest.mark.parametrize("population_size, beam_width", [(4, None), (1, 8)])
+def test_design_rna_shared_feature_map_population(population_size, beam_width):
+    # Populations and beams evaluate the policy on states, not the feature map
+    with pytest.raises(ValueError):
+        design_rna(
+            ["((...))"],
+            timeout=1,
+            restore_path=None,
+            stop_learning=True,
+            restart_timeout=None,
+            network_config=NetworkConfig(),
+            agent_config=AgentConfig(),
+            env_config=RnaDesignEnvironmentConfig(state_radius=1),
+            numpy_policy_path="policy.npz",
+            shared_feature_map=True,
+            population_size=population_size,
+            beam_width=beam_width,
+        )
@@ -0,0 +1,232 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _softmax(logits):
+    """
+    Numerically stable softmax over the last axis.
+
+    Args:
+        logits: Array of unnormalized log-probabilities.
+
+    Returns:
+        Array of probabilities with the same shape as <logits>.
+    """
+    exponentials = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+
+def sample_action(probabilities, deterministic=False):
+    """
+    Draw an action from a categorical distribution.
+
+    Args:
+        probabilities: The probability of each action.
+        deterministic: If set, return the most likely action instead of sampling.
+
+    Returns:
+        The index of the chosen action.
+    """
+    if deterministic:
+        return int(np.argmax(probabilities))
+    cumulative = np.cumsum(probabilities)
+    action = int(np.searchsorted(cumulative, np.random.random() * cumulative[-1]))
+    return min(action, len(probabilities) - 1)
+
+
+def sample_actions(probabilities, size, deterministic=False):
+    """
+    Draw <size> independent actions from a categorical distribution.
+
+    Args:
+        probabilities: The probability of each action.
+        size: The number of actions to draw.
+        deterministic: If set, return the most likely action <size> times.
+
+    Returns:
+        Array with the indices of the chosen actions.
+    """
+    if deterministic:
+        return np.full(size, np.argmax(probabilities))
+    cumulative = np.cumsum(probabilities)
+    actions = np.searchsorted(cumulative, np.random.random(size) * cumulative[-1])
+    return np.minimum(actions, len(probabilities) - 1)
+
+
+def beam_search(probabilities, beam_width):
+    """
+    Find the action sequences with the highest cumulative log-probability, given the
+    action distribution of every timestep in advance.
+
+    Args:
+        probabilities: Array of shape (timesteps, actions).
+        beam_width: The number of sequences to keep.
+
+    Returns:
+        Array of shape (beams, timesteps), ordered by decreasing log-probability.
+    """
+    num_actions = probabilities.shape[1]
+    log_probabilities = np.log(np.maximum(probabilities, 1e-12))
+    scores = np.zeros(1)
+    sequences = np.zeros((1, 0), dtype=int)
+    for step_log_probabilities in log_probabilities:
+        candidates = (scores[:, None] + step_log_probabilities).ravel()
+        keep = np.argsort(-candidates, kind="stable")[:beam_width]
+        sequences = np.column_stack(
+            [sequences[keep // num_actions], keep % num_actions]
+        )
+        scores = candidates[keep]
+    return sequences
+
+
+def _find_logits(model, action_name="action"):
+    """
+    Locate the logits of an action distribution in a built tensorforce graph.
+
+    The categorical distribution samples via tf.where(deterministic, argmax(logits),
+    argmax(logits + gumbel)), so the logits are the input of the ArgMax that is not
+    fed by the Gumbel noise addition.
+
+    Args:
+        model: The tensorforce model of an agent.
+        action_name: The name of the action in the action specification.
+
+    Returns:
+        The logits tensor of the act path.
+    """
+    pending = [model.actions_output[action_name].op]
+    visited = set()
+    while pending:
+        operation = pending.pop(0)
+        if operation.type == "ArgMax" and operation.inputs[0].op.type != "Add":
+            return operation.inputs[0]
+        for tensor in operation.inputs:
+            if tensor.op.name not in visited:
+                visited.add(tensor.op.name)
+                pending.append(tensor.op)
+    raise ValueError(f"No logits found for action '{action_name}'")
+
+
+class TensorforcePolicy(object):
+    """
+    Action distribution of a tensorforce agent, evaluated without going through
+    agent.act.
+    """
+
+    def __init__(self, agent):
+        """
+        Initialize the policy from a built agent.
+
+        Args:
+            agent: A tensorforce agent with a categorical action distribution.
+        """
+        model = agent.model
+        self._session = model.session
+        self._state_input = model.states_input["state"]
+        self._internals_input = model.internals_input
+        self._internals_output = model.internals_output
+        self._internals_init = model.internals_init
+        self._logits = _find_logits(model)
+        self._feed_dict = {model.deterministic_input: True}
+        if hasattr(model, "update_input"):
+            self._feed_dict[model.update_input] = False
+        self.reset()
+
+    @property
+    def recurrent(self):
+        return bool(self._internals_input)
+
+    def reset(self):
+        """
+        Reset the internal state of recurrent layers, done at the start of an episode.
+        """
+        self.internals = list(self._internals_init)
+
+    def probabilities(self, state):
+        """
+        Compute the action distribution for a single state. Advances the internal
+        state of recurrent layers.
+
+        Args:
+            state: The state as returned by the environment.
+
+        Returns:
+            Array with the probability of each action.
+        """
+        feed_dict = dict(self._feed_dict)
+        feed_dict[self._state_input] = (state,)
+        for internal_input, internal in zip(self._internals_input, self.internals):
+            feed_dict[internal_input] = (internal,)
+        logits, internals = self._session.run(
+            (self._logits, self._internals_output), feed_dict=feed_dict
+        )
+        self.internals = [internal[0] for internal in internals]
+        return _softmax(logits[0])
+
+    def act(self, state, deterministic=False):
+        return sample_action(self.probabilities(state), deterministic)
+
+
+class PolicyCache(object):
+    """
+    LRU cache mapping states to the action distribution of a frozen policy.
+
+    Only valid while the weights of the policy do not change and the action
+    distribution depends on the current state alone.
+    """
+
+    def __init__(self, policy, maxsize):
+        """
+        Initialize an empty cache.
+
+        Args:
+            policy: Object providing probabilities(state).
+            maxsize: Maximum number of cached states before evicting the least
+                recently used one.
+        """
+        if getattr(policy, "recurrent", False):
+            raise ValueError("Recurrent policies depend on more than the state")
+        self.policy = policy
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def probabilities(self, state):
+        """
+        Get the action distribution for <state>, evaluating the policy on a miss.
+
+        Args:
+            state: The state as returned by the environment.
+
+        Returns:
+            Array with the probability of each action.
+        """
+        key = np.asarray(state).tobytes()
+        try:
+            probabilities = self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probabilities
+        except KeyError:
+            pass
+
+        self.misses += 1
+        probabilities = self.policy.probabilities(state)
+        self._entries[key] = probabilities
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return probabilities
+
+    def act(self, state, deterministic=False):
+        return sample_action(self.probabilities(state), deterministic)
+
+    def reset(self):
+        pass
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,77 @@
+"""
+    Testsuite for policy evaluation helpers.
+"""
+
+import numpy as np
+import numpy.testing as nt
+
+from itertools import product
+
+from .policy import sample_action
+from .policy import beam_search
+from .policy import PolicyCache
+
+
+class _CountingPolicy(object):
+    def __init__(self):
+        self.calls = 0
+
+    def probabilities(self, state):
+        self.calls += 1
+        return np.array([0.1, 0.2, 0.3, 0.4])
+
+
+def test_sample_action():
+    probabilities = np.array([0.0, 0.0, 1.0, 0.0])
+    assert 2 == sample_action(probabilities)
+    assert 2 == sample_action(probabilities, deterministic=True)
+
+    # Test deterministic picks the most likely action
+    assert 3 == sample_action(np.array([0.1, 0.2, 0.3, 0.4]), deterministic=True)
+
+    # Test sampling stays in range
+    actions = [sample_action(np.array([0.25, 0.25, 0.25, 0.25])) for _ in range(100)]
+    assert set(actions) <= {0, 1, 2, 3}
+
+
+def test_PolicyCache():
+    policy = _CountingPolicy()
+    cache = PolicyCache(policy, maxsize=2)
+
+    # Test general behaviour
+    nt.assert_array_equal([0.1, 0.2, 0.3, 0.4], cache.probabilities([[0], [1]]))
+    cache.probabilities([[0], [1]])
+    assert 1 == policy.calls
+    assert 1 == cache.hits
+    assert 1 == cache.misses
+
+    # Test least recently used entry is evicted
+    cache.probabilities([[1], [1]])
+    cache.probabilities([[0], [1]])
+    cache.probabilities([[1], [0]])
+    assert 2 == len(cache)
+    assert 3 == policy.calls
+    cache.probabilities([[1], [1]])
+    assert 4 == policy.calls
+
+    # Test clear
+    cache.clear()
+    assert 0 == len(cache)
+
+
+def test_beam_search():
+    probabilities = np.array(
+        [[0.05, 0.6, 0.25, 0.1], [0.5, 0.08, 0.12, 0.3], [0.27, 0.22, 0.4, 0.11]]
+    )
+
+    # Test against the exhaustive ranking of all sequences
+    sequences = list(product(range(4), repeat=3))
+    scores = [np.prod(probabilities[range(3), sequence]) for sequence in sequences]
+    ranked = [sequences[index] for index in np.argsort(scores)[::-1]]
+
+    beams = beam_search(probabilities, beam_width=5)
+    assert (5, 3) == beams.shape
+    assert ranked[:5] == [tuple(beam) for beam in beams]
+
+    # Test beam width larger than the number of sequences
+    assert (4, 1) == beam_search(probabilities[:1], beam_width=10).shape
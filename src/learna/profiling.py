@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import time
+
+from collections import defaultdict
+
+
+class _Phase(object):
+    """
+    Context measuring one occurrence of a phase. The name may be changed before
+    leaving the context, e.g. once it is known that an observe triggered an update.
+    """
+
+    __slots__ = ["name", "_timer", "_wall", "_cpu"]
+
+    def __init__(self, timer, name):
+        self.name = name
+        self._timer = timer
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        self._timer.record(self.name, wall, time.process_time() - self._cpu)
+        if self._timer.tracer is not None:
+            self._timer.tracer.complete(self.name, self._wall, wall)
+
+
+class _NoPhase(object):
+    """
+    Context doing nothing, used while the timer is disabled.
+    """
+
+    name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def _merge_into(timings, other):
+    for name, stats in other.items():
+        merged = timings.setdefault(name, dict(calls=0, wall=0.0, cpu=0.0))
+        for key, value in stats.items():
+            merged[key] += value
+
+
+class PhaseTimer(object):
+    """
+    Accumulates wall-clock (perf_counter) and CPU (process_time) time per named phase,
+    per episode and in total. Phases may nest, e.g. execute includes fold. The CPU
+    time is that of the whole process, so it includes other threads.
+    """
+
+    def __init__(self, enabled=True, tracer=None):
+        """
+        Initialize the timer.
+
+        Args:
+            enabled: If not set, phases are not measured at all.
+            tracer: Optional ChromeTracer to record every phase occurrence with.
+        """
+        self.enabled = enabled
+        self.tracer = tracer
+        self._episode = defaultdict(lambda: [0, 0.0, 0.0])
+        self._totals = {}
+
+    def phase(self, name):
+        """
+        Measure the enclosed code as one occurrence of a phase.
+
+        Args:
+            name: The name of the phase.
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return _NoPhase()
+        return _Phase(self, name)
+
+    def record(self, name, wall, cpu):
+        """
+        Add one occurrence of a phase to the current episode.
+
+        Args:
+            name: The name of the phase.
+            wall: The elapsed wall-clock time in seconds.
+            cpu: The elapsed CPU time in seconds.
+        """
+        stats = self._episode[name]
+        stats[0] += 1
+        stats[1] += wall
+        stats[2] += cpu
+
+    def end_episode(self):
+        """
+        Close the current episode and add it to the totals.
+
+        Returns:
+            Dictionary from phase names to the calls, wall and cpu time of the episode.
+        """
+        episode = {
+            name: dict(calls=calls, wall=wall, cpu=cpu)
+            for name, (calls, wall, cpu) in self._episode.items()
+        }
+        self._episode.clear()
+        _merge_into(self._totals, episode)
+        return episode
+
+    def timings(self):
+        """
+        Get the totals of all closed episodes.
+
+        Returns:
+            Dictionary from phase names to the calls, wall and cpu time.
+        """
+        return {name: dict(stats) for name, stats in self._totals.items()}
+
+
+class ChromeTracer(object):
+    """
+    Writes phase occurrences as complete events of the Chrome Trace Event format,
+    viewable in chrome://tracing or Perfetto. Can be shared by the timers of several
+    threads, events are attributed to the thread they were recorded in. Events are
+    streamed to the file as they are recorded, so that memory stays constant on long
+    runs. The viewers also accept the file of a run that did not close the tracer.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the tracer.
+
+        Args:
+            path: The path of the trace file.
+        """
+        self._pid = os.getpid()
+        self._start = time.perf_counter()
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._trace_file = open(path, "w")
+        # The JSON array format, one event per line
+        self._trace_file.write("[\n")
+        self._separator = ""
+
+    def _write(self, event):
+        self._trace_file.write(self._separator + json.dumps(event))
+        self._separator = ",\n"
+
+    def complete(self, name, start, duration):
+        """
+        Record a complete event.
+
+        Args:
+            name: The name of the event.
+            start: The perf_counter value at the start of the event.
+            duration: The duration of the event in seconds.
+        """
+        tid = threading.get_ident()
+        event = dict(
+            name=name,
+            ph="X",
+            ts=(start - self._start) * 1e6,
+            dur=duration * 1e6,
+            pid=self._pid,
+            tid=tid,
+        )
+        with self._lock:
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self._write(
+                    dict(
+                        name="thread_name",
+                        ph="M",
+                        pid=self._pid,
+                        tid=tid,
+                        args=dict(name=threading.current_thread().name),
+                    )
+                )
+            self._write(event)
+
+    def close(self):
+        """
+        Terminate the event array and close the trace file.
+        """
+        with self._lock:
+            self._trace_file.write("\n]\n")
+            self._trace_file.close()
+
+
+def merge_timings(timings):
+    """
+    Sum the timings of several timers, e.g. of the threads of a ThreadedRunner.
+
+    Args:
+        timings: Iterable of dictionaries as returned by PhaseTimer.timings.
+
+    Returns:
+        The summed timings.
+    """
+    merged = {}
+    for other in timings:
+        _merge_into(merged, other)
+    return merged
+
+
+def format_timings(timings):
+    """
+    Format timings as a table, sorted by decreasing wall-clock time.
+
+    Args:
+        timings: Dictionary as returned by PhaseTimer.timings.
+
+    Returns:
+        The table as a string.
+    """
+    lines = [f"{'phase':<20}{'calls':>10}{'wall [s]':>12}{'cpu [s]':>12}"]
+    for name, stats in sorted(timings.items(), key=lambda item: -item[1]["wall"]):
+        lines.append(
+            f"{name:<20}{stats['calls']:>10}{stats['wall']:>12.3f}{stats['cpu']:>12.3f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+"""
+    Testsuite for the phase timer and tracer.
+"""
+
+import json
+
+from .profiling import PhaseTimer
+from .profiling import ChromeTracer
+from .profiling import merge_timings
+
+
+def test_PhaseTimer():
+    timer = PhaseTimer()
+    with timer.phase("act"):
+        pass
+    with timer.phase("observe") as phase:
+        phase.name = "update"
+    timer.record("act", 1.0, 0.5)
+
+    # Test episode timings
+    episode = timer.end_episode()
+    assert {"act", "update"} == set(episode)
+    assert 2 == episode["act"]["calls"]
+    assert 1.0 <= episode["act"]["wall"]
+    assert {} == timer.end_episode()
+
+    # Test totals over episodes
+    timer.record("act", 1.0, 0.5)
+    timer.end_episode()
+    assert 3 == timer.timings()["act"]["calls"]
+    assert 6 == merge_timings([timer.timings(), timer.timings()])["act"]["calls"]
+
+    # Test disabled timer
+    timer = PhaseTimer(enabled=False)
+    with timer.phase("act"):
+        pass
+    assert {} == timer.end_episode()
+
+
+def test_ChromeTracer(tmp_path):
+    path = tmp_path.joinpath("trace.json")
+    tracer = ChromeTracer(path)
+    timer = PhaseTimer(tracer=tracer)
+    with timer.phase("episode"):
+        with timer.phase("fold"):
+            pass
+    tracer.close()
+
+    events = json.loads(path.read_text())
+    assert ["thread_name", "fold", "episode"] == [event["name"] for event in events]
+    fold, episode = events[1:]
+    assert "X" == fold["ph"] and fold["tid"] == episode["tid"]
+    assert episode["ts"] <= fold["ts"]
+    assert fold["ts"] + fold["dur"] <= episode["ts"] + episode["dur"]
+
+
+def test_ChromeTracer_streaming(tmp_path):
+    path = tmp_path.joinpath("trace.json")
+    tracer = ChromeTracer(path)
+    timer = PhaseTimer(tracer=tracer)
+    for _ in range(1000):
+        with timer.phase("act"):
+            pass
+    tracer._trace_file.flush()
+
+    # Test events are on disk before closing, readable as by the viewers
+    events = json.loads(path.read_text() + "]")
+    assert 1001 == len(events)
+    tracer.close()
+    assert events == json.loads(path.read_text())
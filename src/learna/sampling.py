@@ -0,0 +1,257 @@
+import threading
+from collections import defaultdict
+from functools import partial
+
+import numpy as np
+
+
+class SumTree(object):
+    """
+    Binary tree whose inner nodes hold the sum of their children, for sampling
+    proportionally to priorities and updating them in O(log n).
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialize a tree with all priorities set to 0.
+
+        Args:
+            capacity: The number of leaves.
+        """
+        self.capacity = capacity
+        self._leaf_offset = 1
+        while self._leaf_offset < capacity:
+            self._leaf_offset *= 2
+        self._nodes = np.zeros(2 * self._leaf_offset)
+
+    @property
+    def total(self):
+        return self._nodes[1]
+
+    def __getitem__(self, index):
+        return self._nodes[self._leaf_offset + index]
+
+    def update(self, index, priority):
+        """
+        Set the priority of a leaf.
+
+        Args:
+            index: The index of the leaf.
+            priority: The new non-negative priority.
+        """
+        node = self._leaf_offset + index
+        change = priority - self._nodes[node]
+        while node:
+            self._nodes[node] += change
+            node //= 2
+
+    def find(self, value):
+        """
+        Find the leaf at which the cumulative priority exceeds <value>.
+
+        Args:
+            value: A value in [0, total).
+
+        Returns:
+            The index of the leaf.
+        """
+        node = 1
+        while node < self._leaf_offset:
+            node *= 2
+            if value >= self._nodes[node] and self._nodes[node + 1] > 0:
+                value -= self._nodes[node]
+                node += 1
+        return min(node - self._leaf_offset, self.capacity - 1)
+
+    def sample(self):
+        return self.find(np.random.random() * self.total)
+
+
+class UniformSampler(object):
+    """
+    Draw the targets in random order, epoch by epoch.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self._order = []
+
+    def sample(self):
+        if not self._order:
+            self._order = list(np.random.permutation(len(self.targets)))
+        return self.targets[self._order.pop()]
+
+    def update(self, target, normalized_hamming_distance):
+        pass
+
+
+class LengthBucketSampler(object):
+    """
+    Draw a length bucket, then a target of that bucket uniformly.
+
+    With a <window>, the bucket is kept for that many episodes, so that consecutive
+    episodes, and the updates built from them, see targets of similar length.
+    Samplers with the same seed follow the same sequence of buckets.
+    """
+
+    def __init__(
+        self,
+        targets,
+        bucket_width=50,
+        window=1,
+        weighting="uniform",
+        seed=None,
+    ):
+        """
+        Initialize the sampler.
+
+        Args:
+            targets: The targets to draw from.
+            bucket_width: The range of lengths of a bucket.
+            window: The number of episodes to draw from a bucket before changing it.
+            weighting: Either uniform, so that rare lengths are seen as often as
+                common ones, or frequency, proportional to the size of the buckets.
+            seed: Optional seed of the bucket schedule.
+        """
+        if weighting not in ("uniform", "frequency"):
+            raise ValueError(f"Unknown weighting {weighting}")
+        self.targets = targets
+        self.window = window
+        buckets = defaultdict(list)
+        for target in targets:
+            buckets[len(target) // bucket_width].append(target)
+        self.buckets = [buckets[key] for key in sorted(buckets)]
+        sizes = np.array([len(bucket) for bucket in self.buckets], dtype=float)
+        if weighting == "uniform":
+            sizes[:] = 1
+        self.weights = sizes / sizes.sum()
+        self._schedule = np.random.RandomState(seed)
+        self._bucket = None
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self._remaining <= 0:
+                index = self._schedule.choice(len(self.buckets), p=self.weights)
+                self._bucket = self.buckets[index]
+                self._remaining = self.window
+            self._remaining -= 1
+            return self._bucket[np.random.randint(len(self._bucket))]
+
+    def update(self, target, normalized_hamming_distance):
+        pass
+
+
+class PrioritySampler(object):
+    """
+    Draw targets proportionally to their recent normalized Hamming distance plus a
+    bonus growing with the number of samples since they were last designed. Unseen
+    targets start with the highest priority.
+
+    Keeping the staleness bonus exact would need an update of every target after every
+    sample, so only <refresh> targets are refreshed per sample, round-robin.
+    """
+
+    def __init__(
+        self,
+        targets,
+        alpha=1.0,
+        decay=0.5,
+        staleness_bonus=0.1,
+        epsilon=0.01,
+        refresh=4,
+    ):
+        """
+        Initialize the sampler.
+
+        Args:
+            targets: The targets to draw from.
+            alpha: Exponent sharpening (> 1) or flattening (< 1) the priorities.
+            decay: Weight of the older distances in the moving average.
+            staleness_bonus: Bonus of a target that was not designed for as many
+                samples as there are targets.
+            epsilon: Minimum distance term, so that solved targets are still drawn.
+            refresh: The number of targets to refresh the bonus of per sample.
+        """
+        self.targets = targets
+        self.alpha = alpha
+        self.decay = decay
+        self.staleness_bonus = staleness_bonus
+        self.epsilon = epsilon
+        self.refresh = refresh
+
+        self._indices = {id(target): index for index, target in enumerate(targets)}
+        self._distances = np.ones(len(targets))
+        self._last_update = np.zeros(len(targets), dtype=int)
+        self._samples = 0
+        self._next_refresh = 0
+        self._tree = SumTree(len(targets))
+        for index in range(len(targets)):
+            self._update_priority(index)
+        self._lock = threading.Lock()
+
+    def _update_priority(self, index):
+        age = (self._samples - self._last_update[index]) / len(self.targets)
+        priority = (self._distances[index] + self.epsilon) ** self.alpha
+        self._tree.update(index, priority + self.staleness_bonus * min(age, 1.0))
+
+    def sample(self):
+        with self._lock:
+            for _ in range(min(self.refresh, len(self.targets))):
+                self._update_priority(self._next_refresh)
+                self._next_refresh = (self._next_refresh + 1) % len(self.targets)
+            self._samples += 1
+            return self.targets[self._tree.sample()]
+
+    def update(self, target, normalized_hamming_distance):
+        """
+        Feed the result of designing a target.
+
+        Args:
+            target: The target.
+            normalized_hamming_distance: The distance reached on the target.
+        """
+        with self._lock:
+            index = self._indices[id(target)]
+            self._distances[index] = (
+                self.decay * self._distances[index]
+                + (1 - self.decay) * normalized_hamming_distance
+            )
+            self._last_update[index] = self._samples
+            self._update_priority(index)
+
+
+_SAMPLERS = dict(
+    uniform=UniformSampler, length=LengthBucketSampler, priority=PrioritySampler
+)
+
+
+def get_sampler_fn(name, shared=False, **kwargs):
+    """
+    Get a function building a target sampler.
+
+    Args:
+        name: One of uniform, length and priority.
+        shared: If set, build a single sampler from the targets of the first
+            environment and return it to all environments, e.g. threads sharing one
+            model, so that priorities and buckets are common to all of them.
+            Otherwise, e.g. in actor processes, every environment keeps its own.
+        **kwargs: Arguments of the sampler.
+
+    Returns:
+        Function taking the targets and returning the sampler.
+    """
+    if name not in _SAMPLERS:
+        raise ValueError(f"Unknown sampler {name}")
+    get_sampler = partial(_SAMPLERS[name], **kwargs)
+    if not shared:
+        return get_sampler
+    samplers = []
+
+    def get_shared_sampler(targets):
+        if not samplers:
+            samplers.append(get_sampler(targets))
+        return samplers[0]
+
+    return get_shared_sampler
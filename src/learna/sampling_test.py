@@ -0,0 +1,95 @@
+"""
+    Testsuite for the target samplers.
+"""
+
+from collections import Counter
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from .sampling import SumTree
+from .sampling import UniformSampler
+from .sampling import LengthBucketSampler
+from .sampling import PrioritySampler
+from .sampling import get_sampler_fn
+
+
+def test_SumTree():
+    tree = SumTree(5)
+    for index, priority in enumerate([1, 0, 2, 3, 4]):
+        tree.update(index, priority)
+    assert 10 == tree.total
+    assert 0 == tree.find(0)
+    assert 0 == tree.find(0.99)
+    assert 2 == tree.find(1)
+    assert 3 == tree.find(3)
+    assert 4 == tree.find(9.99)
+
+    tree.update(4, 0)
+    assert 6 == tree.total
+    assert 3 == tree.find(5.99)
+
+
+def test_UniformSampler():
+    targets = list("abcde")
+    sampler = UniformSampler(targets)
+    assert sorted(targets * 2) == sorted(sampler.sample() for _ in range(10))
+
+
+def test_LengthBucketSampler():
+    np.random.seed(0)
+    targets = ["." * 10] * 9 + ["." * 100]
+    sampler = LengthBucketSampler(targets, bucket_width=50)
+    counts = Counter(len(sampler.sample()) for _ in range(1000))
+    assert 400 < counts[100] < 600
+
+
+def test_PrioritySampler():
+    np.random.seed(0)
+    targets = [f"{i}" for i in range(10)]
+    sampler = PrioritySampler(targets, staleness_bonus=0.0)
+    for target in targets * 10:
+        sampler.update(target, 1.0 if target == "0" else 0.0)
+    counts = Counter(sampler.sample() for _ in range(1000))
+    assert counts["0"] > 500
+
+    # Staleness keeps solved targets from starving
+    sampler = PrioritySampler(targets, staleness_bonus=1.0, refresh=10)
+    for target in targets:
+        sampler.update(target, 1.0 if target == "0" else 0.0)
+    for _ in range(100):
+        target = sampler.sample()
+        sampler.update(target, 1.0 if target == "0" else 0.0)
+    counts = Counter(sampler.sample() for _ in range(1000))
+    assert counts["0"] < 500
+
+
+def test_LengthBucketSampler_window():
+    targets = ["." * 10] * 3 + ["." * 100]
+    sampler = LengthBucketSampler(targets, window=4, weighting="frequency", seed=0)
+    other = LengthBucketSampler(targets, window=4, weighting="frequency", seed=0)
+    lengths = [len(sampler.sample()) for _ in range(400)]
+    assert lengths == [len(other.sample()) for _ in range(400)]
+    for start in range(0, 400, 4):
+        assert 1 == len(set(lengths[start : start + 4]))
+    assert 200 < lengths.count(10) < 400
+
+
+def test_get_sampler_fn():
+    targets = [f"{i}" for i in range(10)]
+    get_sampler = get_sampler_fn("priority", refresh=2)
+    assert get_sampler(targets) is not get_sampler(targets)
+
+    # Environments share the sampler built from the first targets
+    get_sampler = get_sampler_fn("priority", shared=True, refresh=2)
+    sampler = get_sampler(targets)
+    assert sampler is get_sampler(list(targets))
+
+    def design(_):
+        target = sampler.sample()
+        sampler.update(target, 0.0)
+
+    with ThreadPool(4) as pool:
+        pool.map(design, range(1000))
+    assert 1000 == sampler._samples
+    assert 0 < sampler._last_update.min()
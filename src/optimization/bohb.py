@@ -11,11 +11,14 @@ import pickle
 import time
 
 import hpbandster.core.nameserver as hpns
-import hpbandster.core.result as hpres
 
 from hpbandster.optimizers import BOHB as BOHB
 from src.optimization.learna_worker import LearnaWorker
 from src.optimization.meta_learna_worker import MetaLearnaWorker
+from src.optimization.local_bohb import LocalBOHB
+from src.optimization.result_store import ResultStore, load_result
+from src.optimization.warmstart import load_previous_results, warmstart
+from src.optimization.surrogate import SurrogateWorker
 
 
 parser = argparse.ArgumentParser(
@@ -64,6 +67,36 @@ parser.add_argument(
 )
 
 parser.add_argument("--mode", choices=["learna", "meta_learna"], default="learna")
+parser.add_argument(
+    "--backend",
+    choices=["pyro", "local"],
+    default="pyro",
+    help="Run workers over a Pyro nameserver or as local processes",
+)
+parser.add_argument(
+    "--n_workers", type=int, help="Number of local worker processes.", default=1
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="Continue from the results stored in the shared directory",
+)
+parser.add_argument(
+    "--warmstart",
+    nargs="+",
+    default=[],
+    help="Results of earlier runs to fit the model on, results.pkl or log directories",
+)
+parser.add_argument(
+    "--surrogate",
+    nargs="+",
+    help="Answer from a model of these earlier results instead of evaluating",
+)
+parser.add_argument(
+    "--racing",
+    action="store_true",
+    help="Stop evaluating configurations that can not beat the best one (learna)",
+)
 
 
 # args=parser.parse_args("--run_id test --nic_name lo --shared_directory /tmp --n_cores 4 --data_dir src/data --mode L2DesignRNA".split())
@@ -74,7 +107,10 @@ os.makedirs(args.shared_directory, exist_ok=True)
 if args.mode == "learna":
     worker_cls = LearnaWorker
     worker_args = dict(
-        data_dir=args.data_dir, num_cores=args.n_cores, train_sequences=range(1, 100, 3)
+        data_dir=args.data_dir,
+        num_cores=args.n_cores,
+        train_sequences=range(1, 100, 3),
+        racing=args.racing,
     )
 
 if args.mode == "meta_learna":
@@ -87,6 +123,39 @@ if args.mode == "meta_learna":
     )
 
 
+configspace = worker_cls.get_configspace()
+if args.surrogate:
+    worker_cls = SurrogateWorker
+    worker_args = dict(configspace=configspace, previous_results_paths=args.surrogate)
+
+if not args.worker:
+    # Every evaluation is stored at once, so that a crashed run can be resumed
+    result_logger = ResultStore(args.shared_directory, resume=args.resume)
+    previous_result = None
+    if result_logger.iteration_offset:
+        previous_result = load_result(args.shared_directory)
+
+if args.backend == "local":
+    bohb = LocalBOHB(
+        configspace=configspace,
+        worker_cls=worker_cls,
+        worker_args=worker_args,
+        n_workers=args.n_workers,
+        min_budget=args.min_budget,
+        max_budget=args.max_budget,
+        working_directory=args.shared_directory,
+        result_logger=result_logger,
+        previous_result=previous_result,
+    )
+    for path in args.warmstart:
+        warmstart(bohb.config_generator, load_previous_results(path), bohb.budgets)
+    res = bohb.run(n_iterations=args.n_iterations)
+    result_logger.close()
+    with open(os.path.join(args.shared_directory, "results.pkl"), "wb") as fh:
+        pickle.dump(res, fh)
+    exit(0)
+
+
 # Every process has to lookup the hostname
 host = hpns.nic_name_to_host(args.nic_name)
 
@@ -96,7 +165,6 @@ if args.worker:
     w.load_nameserver_credentials(working_directory=args.shared_directory)
     w.run(background=False)
     exit(0)
-result_logger = hpres.json_result_logger(args.shared_directory, overwrite=True)
 
 
 # Start a nameserver:
@@ -118,12 +186,12 @@ w = worker_cls(
 )
 w.run(background=True)
 
-print(worker_cls.get_configspace())
+print(configspace)
 
 # Run an optimizer
 # We now have to specify the host, and the nameserver information
 bohb = BOHB(
-    configspace=worker_cls.get_configspace(),
+    configspace=configspace,
     run_id=args.run_id,
     host=host,
     nameserver=ns_host,
@@ -131,10 +199,14 @@ bohb = BOHB(
     min_budget=args.min_budget,
     max_budget=args.max_budget,
     result_logger=result_logger,
+    previous_result=previous_result,
     ping_interval=600,
     working_directory=args.shared_directory,
 )
+for path in args.warmstart:
+    warmstart(bohb.config_generator, load_previous_results(path), bohb.budgets)
 res = bohb.run(n_iterations=args.n_iterations, min_n_workers=20)
+result_logger.close()
 
 
 # In a cluster environment, you usually want to store the results for later analysis.
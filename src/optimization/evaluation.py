@@ -0,0 +1,194 @@
+"""
+Evaluation of configurations on many target structures with a pool of processes.
+"""
+
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+
+_warm_up_error = None
+
+
+def _warm_up():
+    """
+    Import tensorflow, tensorforce and RNA once per pool process instead of once per
+    task, and let RNA load its energy parameters. A failure is kept for the tasks to
+    raise, as the pool would replace a failing process forever.
+    """
+    global _warm_up_error
+    try:
+        import tensorflow
+        import tensorforce
+        from RNA import fold
+
+        fold("((...))")
+    except Exception as error:
+        _warm_up_error = error
+
+
+def _check_warm_up():
+    if _warm_up_error is not None:
+        raise _warm_up_error
+
+
+def get_evaluation_pool(processes, max_tasks_per_child=50):
+    """
+    Get a pool of pre-warmed processes, to be kept for a whole optimization run and
+    terminated with close_evaluation_pool. Fails if warming up fails.
+
+    Args:
+        processes: The number of processes.
+        max_tasks_per_child: The number of tasks after which a process is replaced,
+            to bound the memory left behind by tensorflow graphs.
+
+    Returns:
+        The pool.
+    """
+    pool = multiprocessing.Pool(
+        processes, initializer=_warm_up, maxtasksperchild=max_tasks_per_child
+    )
+    try:
+        pool.apply(_check_warm_up)
+    except Exception:
+        close_evaluation_pool(pool)
+        raise
+    return pool
+
+
+def close_evaluation_pool(pool):
+    """
+    Stop the processes of a pool, cancelling running tasks.
+    """
+    pool.terminate()
+    pool.join()
+
+
+def _run_task(task):
+    _check_warm_up()
+    sequence_id, function, arguments = task
+    start_time = time.time()
+    result = function(*arguments)
+    return sequence_id, result, time.time() - start_time
+
+
+def evaluate_sequences(
+    pool,
+    function,
+    arguments,
+    sequence_ids,
+    dot_brackets,
+    sequence_times,
+    max_in_flight,
+    should_stop=None,
+):
+    """
+    Evaluate on several target structures, the longest running ones first, one task
+    per target, so that no long target is left for the end. Tasks are handed to the
+    pool one by one as others finish, so that the remaining ones can be cancelled.
+
+    Args:
+        pool: The pool to run the tasks in.
+        function: Picklable function evaluating on a target, e.g. design_rna.
+        arguments: The arguments of <function> per target.
+        sequence_ids: The id of each target.
+        dot_brackets: The target structures, ordered by length if their time is
+            not known yet.
+        sequence_times: Dictionary from target ids to the time of their last
+            evaluation, updated in place.
+        max_in_flight: The number of tasks to keep in the pool, e.g. its size.
+        should_stop: Optional function called after each result, returning True to
+            start no further tasks. Tasks already started still yield their result.
+
+    Yields:
+        The id of a target and its result, in the order they finish.
+    """
+    unknown = [i for i, id_ in enumerate(sequence_ids) if id_ not in sequence_times]
+    known = [i for i, id_ in enumerate(sequence_ids) if id_ in sequence_times]
+    order = sorted(unknown, key=lambda i: len(dot_brackets[i]), reverse=True)
+    order += sorted(known, key=lambda i: sequence_times[sequence_ids[i]], reverse=True)
+    tasks = iter([(sequence_ids[i], function, arguments[i]) for i in order])
+    results = queue.Queue()
+
+    def dispatch():
+        task = next(tasks, None)
+        if task is not None:
+            pool.apply_async(
+                _run_task, (task,), callback=results.put, error_callback=results.put
+            )
+        return task is not None
+
+    in_flight = sum(dispatch() for _ in range(max_in_flight))
+    while in_flight:
+        result = results.get()
+        in_flight -= 1
+        if isinstance(result, BaseException):
+            # Let the tasks in flight finish, so that they do not compete with the
+            # next evaluation in the pool
+            for _ in range(in_flight):
+                results.get()
+            raise result
+        sequence_id, result, elapsed = result
+        sequence_times[sequence_id] = elapsed
+        yield sequence_id, result
+        if not (should_stop and should_stop()):
+            in_flight += dispatch()
+
+
+def summarize_sequence(episodes_info):
+    """
+    Summarize the episodes on a single target structure.
+
+    Args:
+        episodes_info: The EpisodeInfo objects of the target.
+
+    Returns:
+        Dictionary of statistics.
+    """
+    episodes_info = sorted(episodes_info, key=lambda e: e.time)
+    times = np.array([e.time for e in episodes_info])
+    dists = np.array([e.normalized_hamming_distance for e in episodes_info])
+    return {
+        "num_episodes": len(episodes_info),
+        "mean_time_per_episode": float((times[1:] - times[:-1]).mean()),
+        "min_distance": float(dists.min()),
+        "first_distance": float(dists[0]),
+        "last_distance": float(dists[-1]),
+    }
+
+
+class EvaluationSummary(object):
+    """
+    Aggregated statistics of the evaluation on several target structures, updated as
+    the results come in.
+    """
+
+    def __init__(self):
+        self.num_solved = 0
+        self.sum_of_min_distances = 0.0
+        self.sum_of_first_distances = 0.0
+        self.sequence_infos = {}
+
+    def add(self, sequence_id, episodes_info):
+        """
+        Add the result on a target.
+
+        Args:
+            sequence_id: The id of the target.
+            episodes_info: The EpisodeInfo objects of the target.
+        """
+        sequence_info = summarize_sequence(episodes_info)
+        self.num_solved += sequence_info["min_distance"] == 0.0
+        self.sum_of_min_distances += sequence_info["min_distance"]
+        self.sum_of_first_distances += sequence_info["first_distance"]
+        self.sequence_infos[sequence_id] = sequence_info
+
+    def info(self):
+        return {
+            "num_solved": self.num_solved,
+            "sum_of_min_distances": self.sum_of_min_distances,
+            "sum_of_first_distances": self.sum_of_first_distances,
+            "squence_infos": self.sequence_infos,
+        }
@@ -0,0 +1,105 @@
+"""
+    Testsuite for the evaluation of configurations.
+"""
+
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from ..learna.environment import EpisodeInfo
+
+from .evaluation import get_evaluation_pool
+from .evaluation import evaluate_sequences
+from .evaluation import EvaluationSummary
+
+
+class _Pool(object):
+    def __init__(self):
+        self.tasks = []
+
+    def apply_async(self, function, args, callback, error_callback):
+        self.tasks.extend(args)
+        callback(function(*args))
+
+
+def _design(dot_brackets, distances):
+    return [
+        EpisodeInfo(target_id=1, time=time, normalized_hamming_distance=distance)
+        for time, distance in enumerate(distances)
+    ]
+
+
+def test_evaluate_sequences():
+    pool = _Pool()
+    dot_brackets = ["..", "....", "...", "."]
+    arguments = [(dot_bracket, [0.5, 0.0]) for dot_bracket in dot_brackets]
+    sequence_times = {4: 10.0, 3: 0.0}
+    results = list(
+        evaluate_sequences(
+            pool, _design, arguments, [1, 2, 3, 4], dot_brackets, sequence_times, 2
+        )
+    )
+    # Unknown sequences by length, then known ones by time
+    assert [2, 1, 4, 3] == [task[0] for task in pool.tasks]
+    assert [2, 1, 4, 3] == [sequence_id for sequence_id, _ in results]
+    assert {1, 2, 3, 4} == set(sequence_times)
+
+    # Tasks in flight finish after stopping
+    pool = _Pool()
+    results = list(
+        evaluate_sequences(
+            pool,
+            _design,
+            arguments,
+            [1, 2, 3, 4],
+            dot_brackets,
+            sequence_times,
+            2,
+            should_stop=lambda: True,
+        )
+    )
+    assert 2 == len(results)
+
+
+def _design_or_fail(dot_brackets, finished):
+    if dot_brackets == "fail":
+        raise ValueError("Failed to design")
+    time.sleep(0.2)
+    finished.append(dot_brackets)
+    return _design(dot_brackets, [0.0])
+
+
+def test_evaluate_sequences_error():
+    finished = []
+    dot_brackets = ["fail", "....", "..."]
+    arguments = [(dot_bracket, finished) for dot_bracket in dot_brackets]
+    with ThreadPool(2) as pool:
+        with pytest.raises(ValueError):
+            list(
+                evaluate_sequences(
+                    pool, _design_or_fail, arguments, [1, 2, 3], dot_brackets, {}, 2
+                )
+            )
+        # The task in flight finished before raising, the remaining one never started
+        assert ["...."] == finished
+
+
+def test_get_evaluation_pool(monkeypatch):
+    # Warming up fails in the pool processes
+    monkeypatch.setitem(sys.modules, "tensorflow", None)
+    with pytest.raises(ImportError):
+        get_evaluation_pool(1)
+
+
+def test_EvaluationSummary():
+    summary = EvaluationSummary()
+    summary.add(1, _design(None, [0.5, 0.0]))
+    summary.add(2, _design(None, [0.5, 0.25]))
+    info = summary.info()
+    assert 1 == info["num_solved"]
+    assert 0.25 == info["sum_of_min_distances"]
+    assert 1.0 == info["sum_of_first_distances"]
+    assert 2 == info["squence_infos"][2]["num_episodes"]
+    assert 0.25 == info["squence_infos"][2]["last_distance"]
@@ -3,10 +3,8 @@ import os
 os.environ["OMP_NUM_THREADS"] = "1"
 # os.environ['KMP_AFFINITY']='compact,1,0'
 
-import multiprocessing
-
-import numpy as np
 import ConfigSpace as CS
+import Pyro4
 from hpbandster.core.worker import Worker
 
 
@@ -14,18 +12,52 @@ from src.learna.agent import NetworkConfig, get_network, AgentConfig
 from src.learna.environment import RnaDesignEnvironment, RnaDesignEnvironmentConfig
 from src.learna.design_rna import design_rna
 from src.data.parse_dot_brackets import parse_dot_brackets
+from src.optimization.evaluation import (
+    get_evaluation_pool,
+    close_evaluation_pool,
+    evaluate_sequences,
+    EvaluationSummary,
+)
 
 
 class LearnaWorker(Worker):
-    def __init__(self, data_dir, num_cores, train_sequences, **kwargs):
+    def __init__(
+        self,
+        data_dir,
+        num_cores,
+        train_sequences,
+        max_tasks_per_child=50,
+        racing=False,
+        **kwargs
+    ):
         super().__init__(**kwargs)
         self.num_cores = num_cores
+        # Stop evaluating a configuration once its partial loss exceeds the lowest
+        # loss this worker observed on the same budget
+        self.racing = racing
+        self.incumbents = {}  # The lowest loss per budget
+        # Created before any tensorflow session exists, reused by every compute
+        self.pool = get_evaluation_pool(num_cores, max_tasks_per_child)
+        self.sequence_times = {}  # To start the longest running sequences first
+        self.train_sequence_ids = list(train_sequences)
         self.train_sequences = parse_dot_brackets(
             dataset="rfam_learn/validation",
             data_dir=data_dir,
             target_structure_ids=train_sequences,
         )
 
+    def close(self):
+        """
+        Stop the evaluation pool.
+        """
+        close_evaluation_pool(self.pool)
+
+    @Pyro4.expose
+    @Pyro4.oneway
+    def shutdown(self):
+        self.close()
+        super().shutdown()
+
     def compute(self, config, budget, **kwargs):
         """
 		Parameters
@@ -60,10 +92,14 @@ class LearnaWorker(Worker):
             budget, config["restart_timeout"], network_config, agent_config, env_config
         )
 
-        return {
-            "loss": validation_info["sum_of_min_distances"],
-            "info": {"validation_info": validation_info},
-        }
+        # Distances are at most 1, so cancelled sequences count as unsolved
+        loss = (
+            validation_info["sum_of_min_distances"] + validation_info["num_cancelled"]
+        )
+        if not validation_info["num_cancelled"]:
+            self.incumbents[budget] = min(loss, self.incumbents.get(budget, loss))
+
+        return {"loss": loss, "info": {"validation_info": validation_info}}
 
     def _evaluate(
         self,
@@ -88,40 +124,33 @@ class LearnaWorker(Worker):
             for train_sequence in self.train_sequences
         ]
 
-        with multiprocessing.Pool(self.num_cores) as pool:
-            evaluation_results = pool.starmap(design_rna, evaluation_arguments)
+        incumbent = self.incumbents.get(evaluation_timeout)
+        summary = EvaluationSummary()
 
-        evaluation_sequence_infos = {}
-        evaluation_sum_of_min_distances = 0
-        evaluation_sum_of_first_distances = 0
-        evaluation_num_solved = 0
-
-        for r in evaluation_results:
-            sequence_id = r[0].target_id
-            r.sort(key=lambda e: e.time)
-
-            times = np.array(list(map(lambda e: e.time, r)))
-            dists = np.array(list(map(lambda e: e.normalized_hamming_distance, r)))
-
-            evaluation_sum_of_min_distances += dists.min()
-            evaluation_sum_of_first_distances += dists[0]
-
-            evaluation_num_solved += dists.min() == 0.0
-
-            evaluation_sequence_infos[sequence_id] = {
-                "num_episodes": len(r),
-                "mean_time_per_episode": float((times[1:] - times[:-1]).mean()),
-                "min_distance": float(dists.min()),
-                "last_distance": float(dists[-1]),
-            }
-
-        evaluation_info = {
-            "num_solved": int(evaluation_num_solved),
-            "sum_of_min_distances": float(evaluation_sum_of_min_distances),
-            "sum_of_first_distances": float(evaluation_sum_of_first_distances),
-            "squence_infos": evaluation_sequence_infos,
-        }
+        def cannot_win():
+            # The remaining sequences can only add to the loss
+            return (
+                self.racing
+                and incumbent is not None
+                and summary.sum_of_min_distances > incumbent
+            )
 
+        for sequence_id, episodes_info in evaluate_sequences(
+            self.pool,
+            design_rna,
+            evaluation_arguments,
+            self.train_sequence_ids,
+            self.train_sequences,
+            self.sequence_times,
+            self.num_cores,
+            should_stop=cannot_win,
+        ):
+            summary.add(sequence_id, episodes_info)
+
+        evaluation_info = summary.info()
+        evaluation_info["num_cancelled"] = len(self.train_sequences) - len(
+            summary.sequence_infos
+        )
         return evaluation_info
 
     @staticmethod
@@ -0,0 +1,209 @@
+"""
+BOHB on a single machine without a Pyro nameserver. The optimizer runs in the calling
+process and hands configurations to worker processes through local queues. The
+workers are the usual LearnaWorker or MetaLearnaWorker, called directly.
+"""
+
+import copy
+import multiprocessing
+import queue
+import time
+import traceback
+
+import numpy as np
+import hpbandster.core.result as hpres
+from hpbandster.core.base_iteration import WarmStartIteration
+from hpbandster.core.dispatcher import Job
+from hpbandster.optimizers import BOHB
+from hpbandster.optimizers.config_generators.bohb import BOHB as BOHBConfigGenerator
+
+
+def _run_worker(worker_cls, worker_args, jobs, results):
+    """
+    Evaluate jobs until receiving None.
+
+    Args:
+        worker_cls: The hpbandster Worker class.
+        worker_args: The arguments of the worker besides the run id.
+        jobs: Queue of job ids and their arguments.
+        results: Queue to put the job ids, results, exceptions and timestamps on.
+    """
+    worker = worker_cls(**worker_args, run_id="local")
+    for job_id, kwargs in iter(jobs.get, None):
+        started = time.time()
+        result, exception = None, None
+        try:
+            result = worker.compute(config_id=job_id, **kwargs)
+        except Exception:
+            exception = traceback.format_exc()
+        timestamps = dict(started=started, finished=time.time())
+        results.put((job_id, result, exception, timestamps))
+    # E.g. the evaluation pool of LearnaWorker, hpbandster's shutdown needs Pyro
+    if hasattr(worker, "close"):
+        worker.close()
+
+
+class LocalBOHB(object):
+    """
+    Run BOHB with local worker processes.
+    """
+
+    # The Hyperband brackets of hpbandster's BOHB
+    get_next_iteration = BOHB.get_next_iteration
+
+    def __init__(
+        self,
+        configspace,
+        worker_cls,
+        worker_args,
+        n_workers=1,
+        min_budget=1,
+        max_budget=1,
+        eta=3,
+        working_directory=".",
+        result_logger=None,
+        previous_result=None,
+        **config_generator_kwargs
+    ):
+        """
+        Initialize the optimizer.
+
+        Args:
+            configspace: The configuration space to optimize over.
+            worker_cls: The hpbandster Worker class evaluating configurations.
+            worker_args: The arguments of the worker besides the run id.
+            n_workers: The number of worker processes.
+            min_budget: The smallest budget to evaluate configurations on.
+            max_budget: The largest budget to evaluate configurations on.
+            eta: The fraction of configurations promoted to the next budget is 1/eta.
+            working_directory: Passed to the compute method of the workers.
+            result_logger: Optional hpbandster result logger.
+            previous_result: Optional hpbandster Result of an earlier run, to fit
+                BOHB's model on before sampling.
+            **config_generator_kwargs: Arguments of BOHB's model, e.g.
+                min_points_in_model.
+        """
+        self.worker_cls = worker_cls
+        self.worker_args = worker_args
+        self.n_workers = n_workers
+        self.working_directory = working_directory
+        self.result_logger = result_logger
+        self.config_generator = BOHBConfigGenerator(
+            configspace=configspace, **config_generator_kwargs
+        )
+
+        self.eta = eta
+        self.max_SH_iter = -int(np.log(min_budget / max_budget) / np.log(eta)) + 1
+        self.budgets = max_budget * np.power(
+            eta, -np.linspace(self.max_SH_iter - 1, 0, self.max_SH_iter)
+        )
+        self.config = dict(
+            time_ref=time.time(),
+            eta=eta,
+            min_budget=min_budget,
+            max_budget=max_budget,
+            budgets=self.budgets,
+            max_SH_iter=self.max_SH_iter,
+        )
+        self.iterations = []
+        self.warmstart_iteration = []
+        if previous_result is not None:
+            self.warmstart_iteration = [
+                WarmStartIteration(previous_result, self.config_generator)
+            ]
+
+    def _get_next_run(self, n_iterations):
+        while True:
+            for iteration in self.iterations:
+                next_run = None if iteration.is_finished else iteration.get_next_run()
+                if next_run is not None:
+                    return next_run
+            if len(self.iterations) >= n_iterations:
+                return None
+            self.iterations.append(
+                self.get_next_iteration(
+                    len(self.iterations), dict(result_logger=self.result_logger)
+                )
+            )
+
+    @staticmethod
+    def _get_result(results, processes, poll_interval=1.0):
+        """
+        Wait for the next result, failing if a worker process died instead of
+        blocking forever on its job.
+        """
+        while True:
+            try:
+                return results.get(timeout=poll_interval)
+            except queue.Empty:
+                for process in processes:
+                    if not process.is_alive():
+                        raise RuntimeError(
+                            f"Worker process {process.pid} died with exit code "
+                            f"{process.exitcode}"
+                        )
+
+    def run(self, n_iterations=1):
+        """
+        Run Hyperband iterations, sampling configurations from BOHB's model.
+
+        Args:
+            n_iterations: The number of Hyperband iterations.
+
+        Returns:
+            The hpbandster Result object.
+        """
+        jobs, results = multiprocessing.Queue(), multiprocessing.Queue()
+        # Not daemonic, the workers start their own evaluation pools
+        processes = [
+            multiprocessing.Process(
+                target=_run_worker,
+                args=(self.worker_cls, self.worker_args, jobs, results),
+            )
+            for _ in range(self.n_workers)
+        ]
+        for process in processes:
+            process.start()
+
+        running = {}
+        try:
+            while True:
+                while len(running) < self.n_workers:
+                    next_run = self._get_next_run(n_iterations)
+                    if next_run is None:
+                        break
+                    config_id, config, budget = next_run
+                    kwargs = dict(
+                        config=config,
+                        budget=budget,
+                        working_directory=self.working_directory,
+                    )
+                    running[config_id] = job = Job(config_id, **kwargs)
+                    job.time_it("submitted")
+                    jobs.put((config_id, kwargs))
+                if not running:
+                    break
+
+                config_id, result, exception, timestamps = self._get_result(
+                    results, processes
+                )
+                job = running.pop(config_id)
+                job.timestamps.update(timestamps)
+                job.result, job.exception = result, exception
+                if self.result_logger is not None:
+                    self.result_logger(job)
+                self.iterations[config_id[0]].register_result(job)
+                self.config_generator.new_result(job)
+        finally:
+            for _ in processes:
+                jobs.put(None)
+            for process in processes:
+                process.join()
+
+        return hpres.Result(
+            [
+                copy.deepcopy(iteration.data)
+                for iteration in self.warmstart_iteration + self.iterations
+            ],
+            self.config,
+        )
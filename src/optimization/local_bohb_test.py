@@ -0,0 +1,56 @@
+"""
+    Testsuite for the local BOHB backend.
+"""
+
+import os
+
+import pytest
+import ConfigSpace as CS
+from hpbandster.core.worker import Worker
+
+from .local_bohb import LocalBOHB
+
+
+class _QuadraticWorker(Worker):
+    def compute(self, config, budget, **kwargs):
+        return {"loss": (config["x"] - 0.3) ** 2 / budget, "info": {"budget": budget}}
+
+
+class _DyingWorker(Worker):
+    def compute(self, config, budget, **kwargs):
+        os._exit(1)
+
+
+def _get_configspace():
+    configspace = CS.ConfigurationSpace(seed=0)
+    configspace.add_hyperparameter(CS.UniformFloatHyperparameter("x", 0, 1))
+    return configspace
+
+
+def test_LocalBOHB(tmp_path):
+    optimizer = LocalBOHB(
+        _get_configspace(),
+        _QuadraticWorker,
+        {},
+        n_workers=2,
+        min_budget=1,
+        max_budget=9,
+        working_directory=str(tmp_path),
+    )
+    result = optimizer.run(n_iterations=1)
+
+    # One bracket of successive halving: 9 configurations, then 3, then 1
+    runs = result.get_all_runs()
+    assert [9, 3, 1] == [
+        sum(run.budget == budget for run in runs) for budget in (1, 3, 9)
+    ]
+    assert all(run.info == {"budget": run.budget} for run in runs)
+    incumbent = result.get_id2config_mapping()[result.get_incumbent_id()]
+    best = min(run.loss for run in runs if run.budget == 9)
+    assert best == pytest.approx((incumbent["config"]["x"] - 0.3) ** 2 / 9)
+
+
+def test_LocalBOHB_dead_worker():
+    optimizer = LocalBOHB(_get_configspace(), _DyingWorker, {}, n_workers=1)
+    with pytest.raises(RuntimeError, match="died"):
+        optimizer.run(n_iterations=1)
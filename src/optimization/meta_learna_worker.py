@@ -1,10 +1,13 @@
+import json
 import os
 import shutil
 import multiprocessing
+from functools import partial
 
 
 import numpy as np
 import ConfigSpace as CS
+import Pyro4
 from hpbandster.core.worker import Worker
 
 from src.learna.agent import NetworkConfig, get_network, AgentConfig
@@ -12,15 +15,31 @@ from src.learna.environment import RnaDesignEnvironment, RnaDesignEnvironmentCon
 from src.learna.design_rna import design_rna
 from src.learna.learn_to_design_rna import learn_to_design_rna
 from src.data.parse_dot_brackets import parse_dot_brackets
+from src.optimization.evaluation import (
+    get_evaluation_pool,
+    close_evaluation_pool,
+    evaluate_sequences,
+    EvaluationSummary,
+)
 
 
 class MetaLearnaWorker(Worker):
     def __init__(
-        self, data_dir, num_cores, train_sequences, validation_timeout=60, **kwargs
+        self,
+        data_dir,
+        num_cores,
+        train_sequences,
+        validation_timeout=60,
+        max_tasks_per_child=50,
+        **kwargs
     ):
         super().__init__(**kwargs)
         self.num_cores = num_cores
+        # Created before any tensorflow session exists, reused by every compute
+        self.pool = get_evaluation_pool(num_cores, max_tasks_per_child)
         self.validation_timeout = validation_timeout
+        self.sequence_times = {}  # To start the longest running sequences first
+        self.validation_sequence_ids = list(range(1, 101))
         self.train_sequences = parse_dot_brackets(
             dataset="rfam_learn/train",
             data_dir=data_dir,
@@ -29,9 +48,21 @@ class MetaLearnaWorker(Worker):
         self.validation_sequences = parse_dot_brackets(
             dataset="rfam_learn/validation",
             data_dir=data_dir,
-            target_structure_ids=range(1, 101),
+            target_structure_ids=self.validation_sequence_ids,
         )
 
+    def close(self):
+        """
+        Stop the evaluation pool.
+        """
+        close_evaluation_pool(self.pool)
+
+    @Pyro4.expose
+    @Pyro4.oneway
+    def shutdown(self):
+        self.close()
+        super().shutdown()
+
     def compute(self, config, budget, working_directory, config_id, **kwargs):
         """
 		Parameters
@@ -43,8 +74,13 @@ class MetaLearnaWorker(Worker):
         tmp_dir = os.path.join(
             working_directory, "%i_%i_%i" % (config_id[0], config_id[1], config_id[2])
         )
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Hyperband promotes configurations with their id, continue their training
+        trained_budget = _load_trained_budget(tmp_dir, config)
+        if trained_budget is None or trained_budget >= budget:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            trained_budget = 0
         os.makedirs(tmp_dir, exist_ok=True)
+        sampled_config = dict(config)
         config = self._fill_config(config)
 
         network_config = NetworkConfig(
@@ -70,8 +106,15 @@ class MetaLearnaWorker(Worker):
         try:
 
             train_info = self._train(
-                network_config, agent_config, env_config, tmp_dir, budget
+                network_config,
+                agent_config,
+                env_config,
+                tmp_dir,
+                budget - trained_budget,
+                restore_path=tmp_dir if trained_budget else None,
             )
+            train_info["warm_start_budget"] = trained_budget
+            _save_trained_budget(tmp_dir, budget, sampled_config)
             validation_info = self._validate(
                 network_config,
                 agent_config,
@@ -88,7 +131,9 @@ class MetaLearnaWorker(Worker):
             "info": {"train_info": train_info, "validation_info": validation_info},
         }
 
-    def _train(self, network_config, agent_config, env_config, tmp_dir, budget):
+    def _train(
+        self, network_config, agent_config, env_config, tmp_dir, budget, restore_path
+    ):
 
         # create arguments for all sequences
         train_arguments = [
@@ -96,7 +141,7 @@ class MetaLearnaWorker(Worker):
             budget,  # timeout
             self.num_cores,  # worker_count
             tmp_dir,  # save_path
-            None,  # restore_path
+            restore_path,  # restore_path
             network_config,
             agent_config,
             env_config,
@@ -163,41 +208,20 @@ class MetaLearnaWorker(Worker):
             for validation_sequence in self.validation_sequences
         ]
 
-        with multiprocessing.Pool(self.num_cores) as pool:
-            evaluation_results = pool.starmap(design_rna, evaluation_arguments)
-
-        evaluation_sequence_infos = {}
-        evaluation_sum_of_min_distances = 0
-        evaluation_sum_of_first_distances = 0
-        evaluation_num_solved = 0
-
-        for r in evaluation_results:
-            sequence_id = r[0].target_id
-            r.sort(key=lambda e: e.time)
-
-            times = np.array(list(map(lambda e: e.time, r)))
-            dists = np.array(list(map(lambda e: e.normalized_hamming_distance, r)))
-
-            evaluation_sum_of_min_distances += dists.min()
-            evaluation_sum_of_first_distances += dists[0]
-
-            evaluation_num_solved += dists.min() == 0.0
-
-            evaluation_sequence_infos[sequence_id] = {
-                "num_episodes": len(r),
-                "mean_time_per_episode": float((times[1:] - times[:-1]).mean()),
-                "min_distance": float(dists.min()),
-                "last_distance": float(dists[-1]),
-            }
-
-        evaluation_info = {
-            "num_solved": int(evaluation_num_solved),
-            "sum_of_min_distances": float(evaluation_sum_of_min_distances),
-            "sum_of_first_distances": float(evaluation_sum_of_first_distances),
-            "squence_infos": evaluation_sequence_infos,
-        }
-
-        return evaluation_info
+        # Each pool process restores the trained model once for all its sequences
+        evaluate = partial(design_rna, cache_agent=stop_learning)
+        summary = EvaluationSummary()
+        for sequence_id, episodes_info in evaluate_sequences(
+            self.pool,
+            evaluate,
+            evaluation_arguments,
+            self.validation_sequence_ids,
+            self.validation_sequences,
+            self.sequence_times,
+            self.num_cores,
+        ):
+            summary.add(sequence_id, episodes_info)
+        return summary.info()
 
     @staticmethod
     def get_configspace():
@@ -321,6 +345,26 @@ class MetaLearnaWorker(Worker):
         return config
 
 
+def _load_trained_budget(tmp_dir, config):
+    """
+    Get the budget the model in <tmp_dir> was trained for, or None if there is none
+    or it was trained with another configuration, e.g. by a previous run.
+    """
+    try:
+        with open(os.path.join(tmp_dir, "training.json")) as training_file:
+            training = json.load(training_file)
+        return training["budget"] if training["config"] == config else None
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_trained_budget(tmp_dir, budget, config):
+    path = os.path.join(tmp_dir, "training.json")
+    with open(path + ".tmp", "w") as training_file:
+        json.dump({"budget": budget, "config": config}, training_file)
+    os.replace(path + ".tmp", path)
+
+
 def process_train_results(train_results):
     results_by_sequence = {}
     for r in train_results:
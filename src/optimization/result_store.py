@@ -0,0 +1,170 @@
+"""
+Crash-safe store of optimization results, in the format of hpbandster's
+json_result_logger, so that hpres.logged_results_to_HBS_result can load it.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import hpbandster.core.result as hpres
+
+
+def _repair(path):
+    """
+    Truncate a partially written last line, e.g. after a crash, and return the
+    config ids of the complete lines.
+    """
+    with open(path, "rb+") as fh:
+        content = fh.read()
+        end = content.rfind(b"\n") + 1
+        fh.truncate(end)
+    return [json.loads(line)[0] for line in content[:end].splitlines() if line]
+
+
+def load_records(directory):
+    """
+    Join the configurations and results of a store for analysis.
+
+    Args:
+        directory: The directory of the store.
+
+    Returns:
+        One dictionary per evaluation with config_id, config, budget, loss, info,
+        timestamps and exception.
+    """
+    with open(os.path.join(directory, "configs.json")) as fh:
+        configs = {
+            tuple(config_id): config
+            for config_id, config, _ in map(json.loads, filter(str.strip, fh))
+        }
+    records = []
+    with open(os.path.join(directory, "results.json")) as fh:
+        for line in filter(str.strip, fh):
+            config_id, budget, timestamps, result, exception = json.loads(line)
+            records.append(
+                dict(
+                    config_id=tuple(config_id),
+                    config=configs.get(tuple(config_id)),
+                    budget=budget,
+                    loss=result["loss"] if result else None,
+                    info=result["info"] if result else None,
+                    timestamps=timestamps,
+                    exception=exception,
+                )
+            )
+    return records
+
+
+def load_result(directory):
+    """
+    Load a store as hpbandster Result, e.g. to warm start BOHB when resuming.
+    Crashed evaluations get an infinite loss, which is how BOHB's model counts them
+    during a run, as warm starting fails on a missing loss.
+
+    Args:
+        directory: The directory of the store.
+
+    Returns:
+        The hpbandster Result.
+    """
+    result = hpres.logged_results_to_HBS_result(directory)
+    for datum in result.data.values():
+        for budget, run_result in datum.results.items():
+            if run_result is None or run_result["loss"] is None:
+                datum.results[budget] = dict(
+                    loss=np.inf, info=run_result["info"] if run_result else None
+                )
+    return result
+
+
+class ResultStore(object):
+    """
+    Result logger appending every configuration and finished evaluation. Lines are
+    flushed at once, so they survive a crash of the process, and synced to disk in
+    batches, so that they also survive a crash of the machine without an fsync per
+    evaluation.
+    """
+
+    def __init__(self, directory, resume=False, sync_every=10, sync_interval=60.0):
+        """
+        Initialize the store.
+
+        Args:
+            directory: The directory to write configs.json and results.json to.
+            resume: If set, append to an existing store instead of starting a new
+                one. The iterations of the new run are numbered after the previous
+                ones, so that config ids stay unique.
+            sync_every: The number of lines after which to sync to disk.
+            sync_interval: The time in seconds after which to sync to disk.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.config_ids = set()
+        self.iteration_offset = 0
+
+        config_path = os.path.join(directory, "configs.json")
+        results_path = os.path.join(directory, "results.json")
+        if resume and os.path.exists(config_path) and os.path.exists(results_path):
+            previous_ids = _repair(config_path)
+            previous_ids += _repair(results_path)
+            self.iteration_offset = max((id_[0] + 1 for id_ in previous_ids), default=0)
+        else:
+            open(config_path, "w").close()
+            open(results_path, "w").close()
+        self._config_file = open(config_path, "a")
+        self._results_file = open(results_path, "a")
+
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self._lock = threading.Lock()
+
+    def _shift(self, config_id):
+        return [config_id[0] + self.iteration_offset, *config_id[1:]]
+
+    def _append(self, fh, entry):
+        with self._lock:
+            fh.write(json.dumps(entry) + "\n")
+            fh.flush()
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.sync_every
+                or time.time() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+
+    def _sync(self):
+        for fh in (self._config_file, self._results_file):
+            os.fsync(fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def new_config(self, config_id, config, config_info):
+        if config_id not in self.config_ids:
+            self.config_ids.add(config_id)
+            self._append(
+                self._config_file, [self._shift(config_id), config, config_info]
+            )
+
+    def __call__(self, job):
+        self.new_config(job.id, job.kwargs["config"], {})
+        self._append(
+            self._results_file,
+            [
+                self._shift(job.id),
+                job.kwargs["budget"],
+                job.timestamps,
+                job.result,
+                job.exception,
+            ],
+        )
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._config_file.close()
+            self._results_file.close()
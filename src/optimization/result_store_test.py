@@ -0,0 +1,63 @@
+"""
+    Testsuite for the result store.
+"""
+
+import numpy as np
+import ConfigSpace as CS
+from hpbandster.core.base_iteration import WarmStartIteration
+from hpbandster.optimizers.config_generators.bohb import BOHB
+
+from .result_store import ResultStore
+from .result_store import load_records
+from .result_store import load_result
+
+
+class _Job(object):
+    def __init__(self, id, config, budget, loss):
+        self.id = id
+        self.kwargs = dict(config=config, budget=budget)
+        self.timestamps = dict(submitted=0.0, started=0.0, finished=1.0)
+        self.result = None if loss is None else dict(loss=loss, info=dict(num_solved=0))
+        self.exception = "Traceback" if loss is None else None
+
+
+def test_ResultStore(tmp_path):
+    store = ResultStore(tmp_path, sync_every=2)
+    store.new_config((0, 0, 0), dict(x=1), {})
+    store(_Job((0, 0, 0), dict(x=1), 10, 0.5))
+    store(_Job((1, 0, 0), dict(x=2), 10, 0.25))
+    store.close()
+    with open(tmp_path / "results.json", "a") as fh:
+        fh.write('[[1, 0, 1], 10, {"star')  # Crashed while writing
+
+    store = ResultStore(tmp_path, resume=True)
+    assert 2 == store.iteration_offset
+    store(_Job((0, 0, 0), dict(x=3), 30, 0.0))
+    store.close()
+
+    records = load_records(tmp_path)
+    assert [(0, 0, 0), (1, 0, 0), (2, 0, 0)] == [r["config_id"] for r in records]
+    assert [dict(x=1), dict(x=2), dict(x=3)] == [r["config"] for r in records]
+    assert [0.5, 0.25, 0.0] == [r["loss"] for r in records]
+    assert dict(num_solved=0) == records[2]["info"]
+
+    # A new store starts from scratch
+    ResultStore(tmp_path).close()
+    assert [] == load_records(tmp_path)
+
+
+def test_load_result(tmp_path):
+    store = ResultStore(tmp_path)
+    for i, loss in enumerate([0.5, None, 0.25, 0.75]):
+        store(_Job((0, 0, i), dict(x=i / 4), 10, loss))  # The second one crashed
+    store.close()
+
+    result = load_result(tmp_path)
+    assert [0.5, np.inf, 0.25, 0.75] == [
+        result.get_runs_by_id((0, 0, i))[0].loss for i in range(4)
+    ]
+
+    # Test crashed evaluations do not break warm starting
+    configspace = CS.ConfigurationSpace()
+    configspace.add_hyperparameter(CS.UniformFloatHyperparameter("x", 0, 1))
+    WarmStartIteration(result, BOHB(configspace, min_points_in_model=2))
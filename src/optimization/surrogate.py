@@ -0,0 +1,112 @@
+"""
+Surrogate benchmark: a worker predicting the loss of a configuration from the results
+of earlier optimization runs instead of evaluating it, to try optimizers in seconds.
+"""
+
+import numpy as np
+from hpbandster.core.worker import Worker
+
+from .warmstart import load_previous_results, translate_config
+
+
+class SurrogateModel(object):
+    """
+    K-nearest-neighbour regression of the loss on the numerical representation of the
+    configurations, within [0, 1] per hyperparameter, and the log budget.
+    """
+
+    def __init__(self, configspace, previous_results, k=5, budget_weight=1.0):
+        """
+        Fit the model.
+
+        Args:
+            configspace: The configuration space of the earlier runs.
+            previous_results: List of (config, budget, loss) tuples, see
+                load_previous_results.
+            k: The number of neighbours to average over.
+            budget_weight: The distance between the lowest and the highest budget,
+                relative to the range of a hyperparameter.
+        """
+        self.configspace = configspace
+        self.k = k
+        results = [
+            (configuration, budget, loss)
+            for configuration, budget, loss in (
+                (translate_config(config, configspace), budget, loss)
+                for config, budget, loss in previous_results
+            )
+            if configuration is not None and np.isfinite(loss)
+        ]
+        if not results:
+            raise ValueError("No results to fit the surrogate model on")
+        log_budgets = np.log([budget for _, budget, _ in results])
+        self._log_budget_min = log_budgets.min()
+        self._budget_scale = budget_weight / max(np.ptp(log_budgets), 1e-12)
+        self._features = np.array(
+            [
+                self._get_features(configuration, budget)
+                for configuration, budget, _ in results
+            ]
+        )
+        self._losses = np.array([loss for _, _, loss in results])
+
+    def _get_features(self, configuration, budget):
+        scaled_budget = (np.log(budget) - self._log_budget_min) * self._budget_scale
+        # Inactive hyperparameters are nan
+        return np.append(
+            np.nan_to_num(configuration.get_array(), nan=-1), scaled_budget
+        )
+
+    def predict(self, config, budget):
+        """
+        Predict the loss of a configuration.
+
+        Args:
+            config: Dictionary from hyperparameter names to values.
+            budget: The budget to evaluate on.
+
+        Returns:
+            The inverse distance weighted mean loss of the nearest results.
+        """
+        configuration = translate_config(config, self.configspace)
+        if configuration is None:
+            raise ValueError(
+                f"Configuration {config} is not in the configuration space"
+            )
+        distances = np.linalg.norm(
+            self._features - self._get_features(configuration, budget), axis=1
+        )
+        nearest = np.argsort(distances)[: self.k]
+        weights = 1 / (distances[nearest] + 1e-6)
+        return float(np.dot(weights, self._losses[nearest]) / weights.sum())
+
+
+class SurrogateWorker(Worker):
+    """
+    Drop-in replacement of LearnaWorker or MetaLearnaWorker answering from a
+    SurrogateModel. Only the loss is predicted, the info holds no validation_info.
+    """
+
+    def __init__(self, configspace, previous_results_paths, k=5, **kwargs):
+        """
+        Initialize the worker.
+
+        Args:
+            configspace: The configuration space of the replaced worker.
+            previous_results_paths: Results of earlier runs of the replaced worker,
+                see load_previous_results.
+            k: The number of neighbours of the surrogate model.
+        """
+        super().__init__(**kwargs)
+        previous_results = [
+            result
+            for path in previous_results_paths
+            for result in load_previous_results(path)
+        ]
+        self.model = SurrogateModel(configspace, previous_results, k=k)
+
+    def compute(self, config, budget, **kwargs):
+        return {
+            "loss": self.model.predict(config, budget),
+            "info": {"surrogate_neighbours": self.model.k},
+        }
@@ -0,0 +1,60 @@
+"""
+    Testsuite for the surrogate benchmark.
+"""
+
+import numpy as np
+import pytest
+import ConfigSpace as CS
+
+from .result_store import ResultStore
+from .result_store_test import _Job
+from .surrogate import SurrogateModel
+from .surrogate import SurrogateWorker
+
+
+def _get_configspace():
+    configspace = CS.ConfigurationSpace()
+    configspace.add_hyperparameter(CS.UniformFloatHyperparameter("x", 0, 1))
+    configspace.add_hyperparameter(
+        CS.CategoricalHyperparameter("activation", ["relu", "tanh"])
+    )
+    return configspace
+
+
+def _get_previous_results():
+    return [
+        (dict(x=x, activation="relu"), budget, x * 10 / budget)
+        for x in np.linspace(0, 1, 11)
+        for budget in (1, 9)
+    ] + [
+        (dict(x=0.5, activation="elu"), 9, -100.0),  # Has no translation
+        (dict(x=0.5, activation="relu"), 3, np.inf),
+    ]
+
+
+def test_SurrogateModel():
+    model = SurrogateModel(_get_configspace(), _get_previous_results(), k=3)
+    assert 22 == len(model._losses)
+
+    # Test evaluated configurations are reproduced
+    assert 3.0 == pytest.approx(model.predict(dict(x=0.3, activation="relu"), 1))
+    assert 0.5 == pytest.approx(model.predict(dict(x=0.45, activation="relu"), 9), 0.1)
+    assert 6.0 == pytest.approx(model.predict(dict(x=0.6, activation="relu"), 1))
+
+    with pytest.raises(ValueError):
+        model.predict(dict(x=0.5, activation="elu"), 9)
+    with pytest.raises(ValueError):
+        SurrogateModel(_get_configspace(), _get_previous_results()[-2:])
+
+
+def test_SurrogateWorker(tmp_path):
+    store = ResultStore(tmp_path)
+    for i, (config, budget, loss) in enumerate(_get_previous_results()):
+        store(_Job((0, 0, i), config, budget, loss))
+    store.close()
+
+    worker = SurrogateWorker(
+        _get_configspace(), [str(tmp_path)], k=1, run_id="surrogate"
+    )
+    result = worker.compute(config=dict(x=0.2, activation="relu"), budget=9)
+    assert 2 / 9 == pytest.approx(result["loss"])
@@ -0,0 +1,115 @@
+"""
+Warm-start BOHB's model with the results of earlier optimization runs, possibly over
+a different configuration space or with different budgets.
+"""
+
+import os
+import pickle
+
+import numpy as np
+import ConfigSpace as CS
+from hpbandster.core.dispatcher import Job
+
+from .result_store import load_records
+
+
+def load_previous_results(path):
+    """
+    Load the evaluations of an earlier run.
+
+    Args:
+        path: Either a pickled hpbandster Result or the directory of a result logger,
+            i.e. containing configs.json and results.json.
+
+    Returns:
+        List of (config, budget, loss) tuples of the successful evaluations.
+    """
+    if os.path.isdir(path):
+        return [
+            (record["config"], record["budget"], record["loss"])
+            for record in load_records(path)
+            if record["loss"] is not None and record["config"] is not None
+        ]
+    with open(path, "rb") as fh:
+        result = pickle.load(fh)
+    id2config = result.get_id2config_mapping()
+    return [
+        (id2config[run.config_id]["config"], run.budget, run.loss)
+        for run in result.get_all_runs()
+        if run.loss is not None
+    ]
+
+
+def translate_config(config, configspace):
+    """
+    Translate a configuration of another configuration space: unknown values are
+    dropped, missing ones take their default, numbers are clipped to the bounds.
+
+    Args:
+        config: Dictionary from hyperparameter names to values.
+        configspace: The configuration space to translate to.
+
+    Returns:
+        The Configuration, or None if the configuration has no valid translation.
+    """
+    values = {}
+    for hyperparameter in configspace.get_hyperparameters():
+        value = config.get(hyperparameter.name, hyperparameter.default_value)
+        if isinstance(hyperparameter, CS.CategoricalHyperparameter):
+            if value not in hyperparameter.choices:
+                return None
+        elif isinstance(hyperparameter, CS.UniformIntegerHyperparameter):
+            value = int(
+                np.clip(round(value), hyperparameter.lower, hyperparameter.upper)
+            )
+        elif isinstance(hyperparameter, CS.UniformFloatHyperparameter):
+            value = float(np.clip(value, hyperparameter.lower, hyperparameter.upper))
+        values[hyperparameter.name] = value
+    try:
+        return CS.Configuration(configspace, values=values)
+    except ValueError:  # E.g. violates a condition
+        return None
+
+
+def nearest_budget(budget, budgets):
+    """
+    Get the budget of <budgets> closest to <budget> on a log scale.
+    """
+    return min(budgets, key=lambda b: abs(np.log(b) - np.log(budget)))
+
+
+def warmstart(config_generator, previous_results, budgets):
+    """
+    Feed earlier evaluations to BOHB's config generator before it samples.
+
+    Args:
+        config_generator: The BOHB config generator, e.g. bohb.config_generator.
+        previous_results: List of (config, budget, loss) tuples, see
+            load_previous_results.
+        budgets: The budgets of the current run. Earlier evaluations count for the
+            nearest one.
+
+    Returns:
+        The number of evaluations fed.
+    """
+    jobs = []
+    for config, budget, loss in previous_results:
+        configuration = translate_config(config, config_generator.configspace)
+        if configuration is None:
+            continue
+        job = Job(
+            (-1, 0, len(jobs)),
+            config=configuration.get_dictionary(),
+            budget=nearest_budget(budget, budgets),
+        )
+        job.result = {"loss": loss}
+        jobs.append(job)
+    # The model of a budget is fit on its last result, and results on lower budgets
+    # are ignored once a higher budget has a model
+    jobs.sort(key=lambda job: job.kwargs["budget"])
+    for i, job in enumerate(jobs):
+        last_of_budget = (
+            i == len(jobs) - 1 or jobs[i + 1].kwargs["budget"] != job.kwargs["budget"]
+        )
+        config_generator.new_result(job, update_model=last_of_budget)
+    return len(jobs)
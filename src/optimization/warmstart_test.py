@@ -0,0 +1,94 @@
+"""
+    Testsuite for warm starting BOHB.
+"""
+
+import pickle
+
+import ConfigSpace as CS
+import hpbandster.core.result as hpres
+from hpbandster.optimizers.config_generators.bohb import BOHB
+
+from .result_store import ResultStore
+from .result_store_test import _Job
+from .warmstart import load_previous_results
+from .warmstart import translate_config
+from .warmstart import nearest_budget
+from .warmstart import warmstart
+
+
+def _get_configspace():
+    configspace = CS.ConfigurationSpace()
+    configspace.add_hyperparameter(
+        CS.UniformFloatHyperparameter("learning_rate", 1e-5, 1e-3, log=True)
+    )
+    configspace.add_hyperparameter(
+        CS.UniformIntegerHyperparameter("batch_size", 32, 128, default_value=64)
+    )
+    configspace.add_hyperparameter(
+        CS.CategoricalHyperparameter("activation", ["relu", "tanh"])
+    )
+    return configspace
+
+
+def test_translate_config():
+    configspace = _get_configspace()
+    config = dict(learning_rate=1e-2, batch_size=20.4, activation="tanh", units=5)
+
+    # Test unknown values are dropped and numbers are clipped to the bounds
+    configuration = translate_config(config, configspace)
+    assert dict(learning_rate=1e-3, batch_size=32, activation="tanh") == dict(
+        configuration
+    )
+
+    # Test missing values take their default
+    configuration = translate_config(dict(learning_rate=1e-4), configspace)
+    assert 64 == configuration["batch_size"]
+    assert "relu" == configuration["activation"]
+
+    # Test unknown choices have no translation
+    assert translate_config(dict(activation="elu"), configspace) is None
+
+
+def test_nearest_budget():
+    budgets = [1, 3, 9]
+    assert 1 == nearest_budget(0.5, budgets)
+    assert 3 == nearest_budget(4, budgets)
+    assert 9 == nearest_budget(6, budgets)  # Closer on a log scale
+    assert 9 == nearest_budget(100, budgets)
+
+
+def _write_store(directory):
+    store = ResultStore(directory)
+    for i, loss in enumerate([0.5, None, 0.25]):
+        store(_Job((0, 0, i), dict(learning_rate=1e-4, batch_size=32 + i), 3, loss))
+    store.close()
+
+
+def test_load_previous_results(tmp_path):
+    _write_store(tmp_path)
+    expected = [
+        (dict(learning_rate=1e-4, batch_size=32), 3, 0.5),
+        (dict(learning_rate=1e-4, batch_size=34), 3, 0.25),
+    ]
+    assert expected == load_previous_results(str(tmp_path))
+
+    # Test pickled Results skip the crashed evaluation as well
+    path = tmp_path.joinpath("results.pkl")
+    with open(path, "wb") as fh:
+        pickle.dump(hpres.logged_results_to_HBS_result(str(tmp_path)), fh)
+    assert expected == sorted(
+        load_previous_results(str(path)), key=lambda result: result[0]["batch_size"]
+    )
+
+
+def test_warmstart():
+    config_generator = BOHB(_get_configspace(), min_points_in_model=3)
+    previous_results = [
+        (dict(learning_rate=10 ** -(i % 5 + 1), batch_size=32 + i), budget, i / 10)
+        for i in range(8)
+        for budget in (1, 8)
+    ] + [(dict(activation="elu"), 8, 0.0)]
+
+    assert 16 == warmstart(config_generator, previous_results, [1, 3, 9])
+    assert [1, 9] == sorted(config_generator.configs)
+    assert 9 in config_generator.kde_models
@@ -0,0 +1,344 @@
+"""
+Runner for asynchronous training with actor processes and a single learner.
+
+Each actor process builds its own environment and a local copy of the agent, which
+only acts. Finished episodes are sent to the learner, which replays them to its agent
+and broadcasts the new weights after every update. Unlike the ThreadedRunner, the
+environments do not share a GIL.
+
+Actors are reached through a transport: PipeTransport starts them as local processes,
+SocketTransport accepts actors connecting over the network, e.g. started on other
+hosts with
+
+    python -m src.tensorforce.process_runner --address <host>:<port> --authkey <key>
+"""
+
+import multiprocessing
+import socket
+import time
+from multiprocessing.connection import wait, Client, Connection
+from multiprocessing.connection import AuthenticationError
+from multiprocessing.connection import answer_challenge, deliver_challenge
+
+from .runner import observe_episode, get_variable_values, set_variable_values
+
+
+def run_actor(connection):
+    """
+    Run an actor on a connection to the learner. The learner first sends the actor
+    index, the number of actors and how to build the agent and the environment, then
+    weights until it tells the actor to stop. Episodes are acted with the latest
+    weights received.
+
+    Args:
+        connection: The actor's end of the connection to the learner.
+    """
+    _, (actor_id, actor_count, get_agent, get_environment) = connection.recv()
+    environment = get_environment(actor_id, actor_count)
+    agent = get_agent(environment=environment)
+    message, weights = connection.recv()
+    while message == "weights":
+        # Loading costs a session call per variable, so only load new weights
+        if weights is not None:
+            set_variable_values(agent, weights)
+            weights = None
+
+        state = environment.reset()
+        agent.reset()
+        states, internals, actions, rewards = [], [], [], []
+        terminal = False
+        while not terminal:
+            states.append(state)
+            # act moves next_internals to current_internals and computes new ones
+            internals.append(agent.next_internals)
+            actions.append(agent.act(states=state))
+            state, terminal, reward = environment.execute(actions=actions[-1])
+            rewards.append(reward)
+        connection.send(
+            (states, internals, actions, rewards, environment.episodes_info[-1])
+        )
+
+        # Only the latest weights are of interest
+        while message == "weights" and connection.poll():
+            message, weights = connection.recv()
+    agent.close()
+    environment.close()
+    connection.close()
+
+
+def connect_actor(address, authkey):
+    """
+    Connect to a learner listening on <address> and run an actor.
+
+    Args:
+        address: The (host, port) of the learner.
+        authkey: The authentication key shared with the learner.
+    """
+    run_actor(Client(address, authkey=authkey))
+
+
+def _join(processes, timeout=1):
+    for process in processes:
+        process.join(timeout=timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+# Tensorflow does not survive forking a process with a running session
+_spawn = multiprocessing.get_context("spawn")
+
+
+class PipeTransport(object):
+    """
+    Start the actors as local processes, connected through pipes.
+    """
+
+    def connect(self, actor_count, timeout=None):
+        """
+        Start the actors.
+
+        Args:
+            actor_count: The number of actors.
+            timeout: Unused, pipes connect at once.
+
+        Returns:
+            The learner's end of the connection to each actor.
+        """
+        self._processes = []
+        connections = []
+        for _ in range(actor_count):
+            learner_end, actor_end = _spawn.Pipe()
+            process = _spawn.Process(target=run_actor, args=(actor_end,), daemon=True)
+            process.start()
+            actor_end.close()
+            connections.append(learner_end)
+            self._processes.append(process)
+        return connections
+
+    def close(self):
+        _join(self._processes)
+
+
+class SocketTransport(object):
+    """
+    Accept actors connecting over a socket, e.g. from other hosts.
+    """
+
+    def __init__(self, address, authkey, local_actors=False):
+        """
+        Initialize the transport.
+
+        Args:
+            address: The (host, port) to listen on. Port 0 picks a free port.
+            authkey: The authentication key actors have to present.
+            local_actors: If set, start the actors as local processes connecting
+                over the socket, e.g. for testing.
+        """
+        self.address = address
+        self.authkey = authkey
+        self.local_actors = local_actors
+
+    def _accept(self, timeout):
+        """
+        Accept one connection and authenticate it like a multiprocessing Listener.
+
+        Returns:
+            The connection, or None if the timeout passed or authentication failed.
+        """
+        self._socket.settimeout(timeout)
+        try:
+            client_socket, client_address = self._socket.accept()
+        except socket.timeout:
+            return None
+        client_socket.setblocking(True)
+        connection = Connection(client_socket.detach())
+        try:
+            deliver_challenge(connection, self.authkey)
+            answer_challenge(connection, self.authkey)
+        except (AuthenticationError, EOFError, OSError) as error:
+            print(f"Rejected connection from {client_address}: {error!r}")
+            connection.close()
+            return None
+        return connection
+
+    def connect(self, actor_count, timeout=None):
+        """
+        Wait for <actor_count> actors to connect. Connections failing authentication
+        are skipped.
+
+        Args:
+            actor_count: The number of actors.
+            timeout: Maximum time to wait in seconds. If it passes, only the actors
+                connected until then are returned.
+
+        Returns:
+            The learner's end of the connection to each actor.
+        """
+        self._socket = socket.create_server(self.address)
+        self._processes = []
+        if self.local_actors:
+            for _ in range(actor_count):
+                process = _spawn.Process(
+                    target=connect_actor,
+                    args=(self._socket.getsockname()[:2], self.authkey),
+                    daemon=True,
+                )
+                process.start()
+                self._processes.append(process)
+
+        deadline = time.time() + timeout if timeout else None
+        connections = []
+        while len(connections) < actor_count:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    print(f"Only {len(connections)} of {actor_count} actors connected")
+                    break
+            connection = self._accept(remaining)
+            if connection is not None:
+                connections.append(connection)
+        return connections
+
+    def close(self):
+        _join(self._processes)
+        self._socket.close()
+
+
+class ProcessRunner(object):
+    """
+    Runner for non-realtime training with one learner and several actor processes.
+    """
+
+    def __init__(self, agent, get_agent, get_environment, actor_count, transport=None):
+        """
+        Initialize a ProcessRunner object.
+
+        Args:
+            agent: The learning agent, owned by the calling process.
+            get_agent: Picklable function taking an environment and returning an agent
+                with the same network as <agent>, used by the actors.
+            get_environment: Picklable function taking the actor index and the number
+                of actors and returning the environment of that actor.
+            actor_count: The number of actors.
+            transport: How to reach the actors, PipeTransport by default.
+        """
+        self.agent = agent
+        self.get_agent = get_agent
+        self.get_environment = get_environment
+        self.actor_count = actor_count
+        self.transport = transport or PipeTransport()
+
+    def _broadcast(self, connections):
+        weights = get_variable_values(self.agent, "trainable_variables")
+        for connection in connections:
+            try:
+                connection.send(("weights", weights))
+            except ConnectionError:  # Removed once its end of file is received
+                pass
+
+    def run(self, timeout=None, episodes=None, episode_finished=None):
+        """
+        Train until the timeout or the number of episodes is reached. Raises a
+        RuntimeError if all actors died.
+
+        Args:
+            timeout: Maximum time to run in seconds.
+            episodes: Maximum number of episodes over all actors.
+            episode_finished: Optional function called after each episode with a
+                dictionary of statistics, returning False to stop.
+        """
+        self.episode_rewards = []
+        self.episode_lengths = []
+        self.episodes_info = [[] for _ in range(self.actor_count)]
+        self.global_episode = 0
+
+        self.start_time = time.time()
+        connections = self.transport.connect(self.actor_count, timeout=timeout)
+        actor_ids = {connection: i for i, connection in enumerate(connections)}
+        for actor_id, connection in enumerate(connections):
+            setup = (actor_id, self.actor_count, self.get_agent, self.get_environment)
+            connection.send(("setup", setup))
+        self._broadcast(connections)
+
+        should_stop = False
+        actors_died = False
+        try:
+            while not should_stop and connections:
+                remaining = None
+                if timeout:
+                    remaining = timeout - (time.time() - self.start_time)
+                    if remaining <= 0:
+                        break
+                for connection in wait(connections, timeout=remaining):
+                    try:
+                        episode = connection.recv()
+                    except (EOFError, ConnectionError):
+                        connections.remove(connection)
+                        print(
+                            f"Actor {actor_ids[connection]} died, "
+                            f"{len(connections)} actors left"
+                        )
+                        actors_died = not connections
+                        continue
+                    states, internals, actions, rewards, info = episode
+                    if observe_episode(self.agent, states, internals, actions, rewards):
+                        self._broadcast(connections)
+
+                    actor_id = actor_ids[connection]
+                    self.episode_rewards.append(sum(rewards))
+                    self.episode_lengths.append(len(rewards))
+                    self.episodes_info[actor_id].append(info)
+                    self.global_episode += 1
+
+                    summary_data = {
+                        "actor_id": actor_id,
+                        "episode": self.global_episode,
+                        "timestep": len(rewards),
+                        "episode_reward": sum(rewards),
+                    }
+                    if (
+                        episode_finished
+                        and not episode_finished(summary_data)
+                        or episodes is not None
+                        and self.global_episode >= episodes
+                    ):
+                        should_stop = True
+                        break
+        except KeyboardInterrupt:
+            print("Keyboard interrupt, sending stop command to actors")
+
+        for connection in connections:
+            try:
+                connection.send(("stop", None))
+            except ConnectionError:
+                pass
+        # Discard episodes still in flight, so that no actor blocks on sending
+        deadline = time.time() + 10
+        while connections and time.time() < deadline:
+            for connection in wait(connections, timeout=max(deadline - time.time(), 0)):
+                try:
+                    connection.recv()
+                except (EOFError, ConnectionError):
+                    connection.close()
+                    connections.remove(connection)
+        self.transport.close()
+        if actors_died:
+            raise RuntimeError("All actors died")
+        print("All actors stopped")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--address", required=True, help="The <host>:<port> of the learner"
+    )
+    parser.add_argument(
+        "--authkey", required=True, help="The authentication key of the learner"
+    )
+    args = parser.parse_args()
+
+    host, port = args.address.rsplit(":", 1)
+    connect_actor((host, int(port)), args.authkey.encode())
@@ -0,0 +1,152 @@
+"""
+    Testsuite for the process runner.
+"""
+
+import threading
+import time
+from functools import partial
+from multiprocessing.connection import AuthenticationError, Client
+
+import pytest
+import numpy as np
+
+from ..learna.environment import RnaDesignEnvironmentConfig
+from ..learna.environment import get_shard_environment
+from .process_runner import ProcessRunner
+from .process_runner import PipeTransport
+from .process_runner import SocketTransport
+
+
+class _Variable(object):
+    def __init__(self, name, values):
+        self.name = name
+        self._values = values
+
+    def load(self, value, session):
+        self._values[self.name] = value
+
+
+class _Session(object):
+    def __init__(self):
+        self.values = {"weights:0": np.zeros(2)}
+        self.graph = self
+
+    def get_collection(self, collection):
+        return [_Variable(name, self.values) for name in self.values]
+
+    def run(self, variables):
+        return [self.values[variable.name] for variable in variables]
+
+
+class _Model(object):
+    def __init__(self):
+        self.session = _Session()
+
+
+class _Agent(object):
+    """
+    Stand-in for a tensorforce batch agent, updating after every <batch_size>
+    timesteps and keeping the last timestep for the next batch.
+    """
+
+    batch_size = 8
+
+    def __init__(self, environment=None):
+        self.model = _Model()
+        self.batch_count = 0
+        self.current_internals = []
+        self.next_internals = []
+
+    def reset(self):
+        pass
+
+    def act(self, states):
+        self.current_internals = self.next_internals
+        return np.random.randint(4)
+
+    def observe(self, terminal, reward):
+        self.batch_count += 1
+        if self.batch_count == self.batch_size:
+            self.model.session.values["weights:0"] += 1
+            self.batch_count = 1
+
+    def close(self):
+        pass
+
+
+_get_environment = partial(
+    get_shard_environment,
+    ["((..))", "......", "(....)"],
+    RnaDesignEnvironmentConfig(state_radius=1),
+    None,
+)
+
+
+@pytest.mark.parametrize(
+    "transport",
+    [PipeTransport(), SocketTransport(("localhost", 0), b"test", local_actors=True)],
+)
+def test_ProcessRunner(transport):
+    runner = ProcessRunner(_Agent(), _Agent, _get_environment, 2, transport)
+    summaries = []
+
+    def episode_finished(summary):
+        summaries.append(summary)
+        return True
+
+    runner.run(episodes=10, timeout=60, episode_finished=episode_finished)
+
+    assert 10 == runner.global_episode
+    assert 10 == sum(len(episodes_info) for episodes_info in runner.episodes_info)
+    timesteps = sum(summary["timestep"] for summary in summaries)
+    updates = 1 + (timesteps - _Agent.batch_size) // (_Agent.batch_size - 1)
+    assert updates == runner.agent.model.session.values["weights:0"][0]
+
+    # Test each actor only designs its shard of targets, paired sites take one step
+    shard_lengths = {0: {4, 5}, 1: {6}}
+    for summary in summaries:
+        assert summary["timestep"] in shard_lengths[summary["actor_id"]]
+
+    # Test target ids are global, not numbered per actor
+    target_ids = {0: {1, 3}, 1: {2}}
+    for actor_id, episodes_info in enumerate(runner.episodes_info):
+        assert {info.target_id for info in episodes_info} <= target_ids[actor_id]
+
+
+def _get_failing_environment(actor_id, actor_count):
+    raise RuntimeError("Failed to build the environment")
+
+
+def test_ProcessRunner_actors_died():
+    runner = ProcessRunner(_Agent(), _Agent, _get_failing_environment, 2)
+    with pytest.raises(RuntimeError, match="All actors died"):
+        runner.run(episodes=10, timeout=60)
+
+
+def test_SocketTransport():
+    transport = SocketTransport(("localhost", 0), b"test")
+    connections = []
+    thread = threading.Thread(
+        target=lambda: connections.extend(transport.connect(1, timeout=30))
+    )
+    thread.start()
+    while not hasattr(transport, "_socket"):
+        time.sleep(0.01)
+    address = transport._socket.getsockname()[:2]
+
+    # Test connections with a wrong key are skipped
+    with pytest.raises(AuthenticationError):
+        Client(address, authkey=b"wrong")
+    client = Client(address, authkey=b"test")
+    thread.join()
+    assert 1 == len(connections)
+    connections[0].send("hello")
+    assert "hello" == client.recv()
+    client.close()
+    transport.close()
+
+    # Test waiting ends with the timeout
+    start = time.time()
+    assert [] == transport.connect(1, timeout=0.2)
+    assert time.time() - start < 5
+    transport.close()
@@ -13,8 +13,10 @@
 # limitations under the License.
 # ==============================================================================
 
-# Changes from original tensorforce version include: restart capability and making
-# the weight updates optional.
+# Changes from original tensorforce version include: restart capability, making
+# the weight updates optional, acting through an optional policy object,
+# population episodes, beam search decoding, restarts that keep the graph and
+# pluggable restart strategies, per-phase timings and tracing.
 
 
 from __future__ import absolute_import
@@ -22,16 +24,233 @@ from __future__ import print_function
 from __future__ import division
 
 import time
-import tensorflow as tf
+import numpy as np
 from six.moves import xrange
 
+from ..learna.policy import beam_search, sample_actions
+from ..learna.profiling import PhaseTimer
+
+
+def observe(agent, terminal, reward):
+    """
+    Let a tensorforce agent observe a timestep.
+
+    Args:
+        agent: The agent.
+        terminal: Whether the timestep ends the episode.
+        reward: The reward of the timestep.
+
+    Returns:
+        Whether the agent updated its model. Batch agents count the observed
+        timesteps and restart the count after an update, at 0 or, if they keep the
+        last timestep, at 1, so the count does not grow only after an update.
+    """
+    batch_count = getattr(agent, "batch_count", None)
+    agent.observe(terminal=terminal, reward=reward)
+    return batch_count is not None and agent.batch_count <= batch_count
+
+
+def observe_episode(agent, states, internals, actions, rewards):
+    """
+    Feed an episode that was acted out without agent.act to a tensorforce agent, as
+    if the agent had chosen the actions itself.
+
+    Args:
+        agent: The agent to observe the episode.
+        states: The state of each timestep.
+        internals: The internal state of the agent at each timestep.
+        actions: The action of each timestep.
+        rewards: The reward of each timestep.
+
+    Returns:
+        Whether the agent updated its model during the episode.
+    """
+    last_timestep = len(states) - 1
+    updated = False
+    for timestep, (state, internal, action, reward) in enumerate(
+        zip(states, internals, actions, rewards)
+    ):
+        agent.current_states = dict(state=np.asarray(state))
+        agent.current_internals = internal
+        agent.current_actions = dict(action=action)
+        updated |= observe(agent, terminal=timestep == last_timestep, reward=reward)
+    return updated
+
+
+def get_variable_values(agent, collection="variables"):
+    """
+    Read the values of all variables in the graph of a tensorforce agent.
+
+    Args:
+        agent: The agent.
+        collection: The graph collection of the variables, e.g. trainable_variables
+            for the network weights only.
+
+    Returns:
+        Dictionary from variable names to values.
+    """
+    session = agent.model.session
+    variables = session.graph.get_collection(collection)
+    values = session.run(variables)
+    return {variable.name: value for variable, value in zip(variables, values)}
+
+
+def set_variable_values(agent, values):
+    """
+    Assign values to the variables in the graph of a tensorforce agent. Works on the
+    finalized graph, as it feeds the existing initializer ops.
+
+    Args:
+        agent: The agent.
+        values: Dictionary from variable names to values, e.g. from
+            get_variable_values.
+    """
+    session = agent.model.session
+    for variable in session.graph.get_collection("variables"):
+        if variable.name in values:
+            variable.load(values[variable.name], session)
+
+
+def luby(index):
+    """
+    Get the <index>-th element (1-based) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+
+    Args:
+        index: The position in the sequence, starting at 1.
+
+    Returns:
+        The element of the sequence.
+    """
+    while True:
+        power = 1
+        while power - 1 < index:
+            power *= 2
+        if power - 1 == index:
+            return power // 2
+        index -= power // 2 - 1
+
+
+class FixedRestarts(object):
+    """
+    Restart the agent every <interval> seconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def should_restart(self, iteration_time, environment):
+        return self.interval < iteration_time
+
+    def restarted(self):
+        pass
+
+
+class LubyRestarts(object):
+    """
+    Restart the agent after <unit> times the next element of the Luby sequence
+    seconds.
+    """
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.restarts = 0
+
+    def should_restart(self, iteration_time, environment):
+        return self.unit * luby(self.restarts + 1) < iteration_time
+
+    def restarted(self):
+        self.restarts += 1
+
+
+class GeometricRestarts(object):
+    """
+    Restart the agent after <initial> seconds, growing the interval by <factor> after
+    every restart.
+    """
+
+    def __init__(self, initial, factor=2.0):
+        self.initial = initial
+        self.factor = factor
+        self.restarts = 0
+
+    def should_restart(self, iteration_time, environment):
+        return self.initial * self.factor ** self.restarts < iteration_time
+
+    def restarted(self):
+        self.restarts += 1
+
+
+class ProgressRestarts(object):
+    """
+    Restart the agent once the minimum Hamming distance reached since the last
+    restart has not improved for <window> seconds.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._seen = 0
+        self.restarted()
+
+    def should_restart(self, iteration_time, environment):
+        for info in environment.episodes_info[self._seen :]:
+            if self._best is None or info.normalized_hamming_distance < self._best:
+                self._best = info.normalized_hamming_distance
+                self._improved_at = iteration_time
+        self._seen = len(environment.episodes_info)
+        return self.window < iteration_time - self._improved_at
+
+    def restarted(self):
+        self._best = None
+        self._improved_at = 0.0
+
+
+_RESTART_STRATEGIES = dict(
+    fixed=FixedRestarts,
+    luby=LubyRestarts,
+    geometric=GeometricRestarts,
+    progress=ProgressRestarts,
+)
+
+
+def get_restart_strategy(name, restart_timeout, restart_factor=2.0):
+    """
+    Build a restart strategy.
+
+    Args:
+        name: One of fixed, luby, geometric and progress.
+        restart_timeout: The interval, the Luby unit, the initial interval or the
+            window without progress in seconds, depending on the strategy.
+        restart_factor: The growth factor of the geometric strategy.
+
+    Returns:
+        The restart strategy, or None if <restart_timeout> is not set.
+    """
+    if not restart_timeout:
+        return None
+    if name not in _RESTART_STRATEGIES:
+        raise ValueError(f"Unknown restart strategy {name}")
+    if name == "geometric":
+        return GeometricRestarts(restart_timeout, restart_factor)
+    return _RESTART_STRATEGIES[name](restart_timeout)
+
 
 class Runner(object):
     """
     Simple runner for non-realtime single-process execution.
     """
 
-    def __init__(self, get_agent, environment, repeat_actions=1, history=None):
+    def __init__(
+        self,
+        get_agent,
+        environment,
+        repeat_actions=1,
+        history=None,
+        get_policy=None,
+        restart_weights=None,
+        timer=None,
+        record_episode_timings=False,
+        close_agent=True,
+    ):
         """
         Initialize a Runner object.
 
@@ -39,11 +258,34 @@ class Runner(object):
             agent:
             environment:
             repeat_actions:
+            get_policy: Optional function taking the agent and returning an object
+                with act(state, deterministic), used instead of the agent when
+                learning is stopped. Population episodes require it.
+            restart_weights: How to restart a tensorforce agent. None closes it and
+                calls get_agent again, "initializer" reruns the variable initializers
+                and "snapshot" restores the variable values from construction time.
+                The latter two keep the graph and session alive.
+            timer: Optional PhaseTimer to measure act, execute, observe and update
+                with. Pass the same timer to the environment to include its phases.
+            record_episode_timings: If set, keep the timings of every episode in
+                episode_timings.
+            close_agent: If not set, keep the agent open after running, e.g. when it
+                is cached for further runs.
         """
+        if restart_weights not in (None, "initializer", "snapshot"):
+            raise ValueError(f"Unknown restart_weights {restart_weights}")
         self.get_agent = get_agent
         self.agent = get_agent()
+        self.restart_weights = restart_weights
+        if restart_weights == "snapshot":
+            self._initial_values = get_variable_values(self.agent)
+        self.get_policy = get_policy
+        self.policy = get_policy(self.agent) if get_policy else None
         self.environment = environment
         self.repeat_actions = repeat_actions
+        self.timer = timer or PhaseTimer(enabled=False)
+        self.record_episode_timings = record_episode_timings
+        self.close_agent = close_agent
 
         self.reset(history)
 
@@ -55,6 +297,16 @@ class Runner(object):
         self.episode_rewards = history.get("episode_rewards", list())
         self.episode_timesteps = history.get("episode_timesteps", list())
         self.episode_times = history.get("episode_times", list())
+        self.episode_timings = history.get("episode_timings", list())
+
+    def get_timings(self):
+        """
+        Get the time spent per phase over all finished episodes.
+
+        Returns:
+            Dictionary from phase names to the calls, wall and cpu time in seconds.
+        """
+        return self.timer.timings()
 
     def run(
         self,
@@ -65,6 +317,9 @@ class Runner(object):
         stop_learning=False,
         deterministic=False,
         episode_finished=None,
+        population_size=1,
+        beam_width=None,
+        restart_strategy=None,
     ):
         """
         Runs the agent on the environment.
@@ -77,7 +332,16 @@ class Runner(object):
             episode_finished: Function handler taking a `Runner` argument and returning a boolean indicating
                 whether to continue execution. For instance, useful for reporting intermediate performance or
                 integrating termination conditions.
+            population_size: Number of candidate solutions to sample per episode from
+                a single pass of the policy. The best one is reported.
+            beam_width: If set, the first episode designs the <beam_width> most likely
+                candidate solutions of the frozen policy instead of sampling.
+            restart_strategy: Object deciding when to restart the agent, see
+                get_restart_strategy. Defaults to restarting every <restart_timeout>
+                seconds.
         """
+        if restart_strategy is None and restart_timeout:
+            restart_strategy = FixedRestarts(restart_timeout)
 
         # Keep track of episode reward and episode length for statistics.
         self.start_time = time.time()
@@ -85,6 +349,7 @@ class Runner(object):
         self.agent.reset()
 
         self.episode = self.agent.episode
+        first_episode = self.episode
         if episodes is not None:
             episodes += self.agent.episode
 
@@ -97,48 +362,29 @@ class Runner(object):
             episode_start_time = time.time()
 
             self.agent.reset()
-            state = self.environment.reset()
-            episode_reward = 0
-            self.episode_timestep = 0
+            if self.policy is not None:
+                self.policy.reset()
 
-            while True:
-                action = self.agent.act(states=state, deterministic=deterministic)
-
-                if self.repeat_actions > 1:
-                    reward = 0
-                    for repeat in xrange(self.repeat_actions):
-                        state, terminal, step_reward = self.environment.execute(
-                            actions=action
-                        )
-                        reward += step_reward
-                        if terminal:
-                            break
+            with self.timer.phase("episode"):
+                if beam_width and self.episode == first_episode:
+                    episode_reward = self._run_beam_episode(beam_width)
+                elif population_size > 1:
+                    episode_reward = self._run_population_episode(
+                        population_size, stop_learning, deterministic
+                    )
                 else:
-                    state, terminal, reward = self.environment.execute(actions=action)
-
-                if (
-                    max_episode_timesteps is not None
-                    and self.episode_timestep >= max_episode_timesteps
-                ):
-                    terminal = True
-
-                if not stop_learning:
-                    self.agent.observe(terminal=terminal, reward=reward)
-
-                self.episode_timestep += 1
-                self.timestep += 1
-                episode_reward += reward
-
-                if (
-                    terminal or self.agent.should_stop()
-                ):  # TODO: should_stop also termina?
-                    break
+                    episode_reward = self._run_episode(
+                        max_episode_timesteps, stop_learning, deterministic
+                    )
 
             time_passed = time.time() - episode_start_time
 
             self.episode_rewards.append(episode_reward)
             self.episode_timesteps.append(self.episode_timestep)
             self.episode_times.append(time_passed)
+            episode_timings = self.timer.end_episode()
+            if self.record_episode_timings:
+                self.episode_timings.append(episode_timings)
 
             self.episode += 1
 
@@ -153,11 +399,150 @@ class Runner(object):
                 break
 
             iteration_time = time.time() - iteration_start
-            if restart_timeout and restart_timeout < iteration_time:
+            if restart_strategy and restart_strategy.should_restart(
+                iteration_time, self.environment
+            ):
                 print("restarting")
-                self.agent.close()
-                self.agent = self.get_agent()
+                with self.timer.phase("restart"):
+                    self._restart_agent()
+                restart_strategy.restarted()
                 iteration_start = time.time()
 
-        self.agent.close()
+        if self.close_agent:
+            self.agent.close()
         self.environment.close()
+
+    def _restart_agent(self):
+        if self.restart_weights is None:
+            self.agent.close()
+            self.agent = self.get_agent()
+        else:
+            if self.restart_weights == "initializer":
+                session = self.agent.model.session
+                variables = session.graph.get_collection("variables")
+                session.run([variable.initializer for variable in variables])
+            else:
+                set_variable_values(self.agent, self._initial_values)
+            # Drop experience collected with the previous weights
+            if hasattr(self.agent, "reset_batch"):
+                self.agent.reset_batch()
+        if self.get_policy:
+            self.policy = self.get_policy(self.agent)
+
+    def _run_episode(self, max_episode_timesteps, stop_learning, deterministic):
+        state = self.environment.reset()
+        episode_reward = 0
+        self.episode_timestep = 0
+
+        while True:
+            with self.timer.phase("act"):
+                if stop_learning and self.policy is not None:
+                    action = self.policy.act(state, deterministic=deterministic)
+                else:
+                    action = self.agent.act(states=state, deterministic=deterministic)
+
+            with self.timer.phase("execute"):
+                if self.repeat_actions > 1:
+                    reward = 0
+                    for repeat in xrange(self.repeat_actions):
+                        state, terminal, step_reward = self.environment.execute(
+                            actions=action
+                        )
+                        reward += step_reward
+                        if terminal:
+                            break
+                else:
+                    state, terminal, reward = self.environment.execute(actions=action)
+
+            if (
+                max_episode_timesteps is not None
+                and self.episode_timestep >= max_episode_timesteps
+            ):
+                terminal = True
+
+            if not stop_learning:
+                with self.timer.phase("observe") as phase:
+                    if observe(self.agent, terminal=terminal, reward=reward):
+                        phase.name = "update"
+
+            self.episode_timestep += 1
+            self.timestep += 1
+            episode_reward += reward
+
+            if terminal or self.agent.should_stop():  # TODO: should_stop also termina?
+                break
+
+        return episode_reward
+
+    def _run_population_episode(self, population_size, stop_learning, deterministic):
+        """
+        Design a population of candidate solutions, evaluating the policy once per
+        timestep and sampling one action per candidate. When learning, every
+        candidate is observed by the agent as a separate episode.
+
+        Returns:
+            The best reward of the population.
+        """
+        state = self.environment.reset_population(population_size)
+        states, internals, actions = [], [], []
+        self.episode_timestep = 0
+
+        while True:
+            states.append(state)
+            internals.append(getattr(self.policy, "internals", None))
+            with self.timer.phase("act"):
+                probabilities = self.policy.probabilities(state)
+                actions.append(
+                    sample_actions(probabilities, population_size, deterministic)
+                )
+            with self.timer.phase("execute"):
+                state, terminal, rewards = self.environment.execute_population(
+                    actions[-1]
+                )
+
+            self.episode_timestep += 1
+            self.timestep += 1
+
+            if terminal:
+                break
+
+        if not stop_learning:
+            for candidate, reward in enumerate(rewards):
+                candidate_rewards = [0] * (len(states) - 1) + [reward]
+                candidate_actions = [int(action[candidate]) for action in actions]
+                with self.timer.phase("observe") as phase:
+                    if observe_episode(
+                        self.agent,
+                        states,
+                        internals,
+                        candidate_actions,
+                        candidate_rewards,
+                    ):
+                        phase.name = "update"
+
+        return max(rewards)
+
+    def _run_beam_episode(self, beam_width):
+        """
+        Design the candidate solutions with the highest cumulative log-probability
+        under the frozen policy and evaluate them as one population.
+
+        Returns:
+            The best reward of the beams.
+        """
+        self.environment.reset()
+        states = self.environment.episode_states()
+        with self.timer.phase("act"):
+            probabilities = np.array(
+                [self.policy.probabilities(state) for state in states]
+            )
+            beams = beam_search(probabilities, beam_width)
+
+        self.environment.reset_population(len(beams), keep_target=True)
+        with self.timer.phase("execute"):
+            for actions in beams.T:
+                _, terminal, rewards = self.environment.execute_population(actions)
+        self.episode_timestep = len(states)
+        self.timestep += len(states)
+
+        return max(rewards)
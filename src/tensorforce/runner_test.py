@@ -0,0 +1,72 @@
+"""
+    Testsuite for the runner's restart strategies.
+"""
+
+from ..learna.environment import EpisodeInfo
+from .runner import luby
+from .runner import observe
+from .runner import GeometricRestarts
+from .runner import ProgressRestarts
+
+
+class _Environment(object):
+    def __init__(self):
+        self.episodes_info = []
+
+    def add(self, normalized_hamming_distance):
+        self.episodes_info.append(EpisodeInfo(0, 0.0, normalized_hamming_distance))
+
+
+class _BatchAgent(object):
+    """
+    Stand-in for a tensorforce batch agent keeping the last timestep on updates.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.batch_count = 0
+
+    def observe(self, terminal, reward):
+        self.batch_count += 1
+        if self.batch_count >= self.batch_size:
+            self.batch_count = 1
+
+
+def test_observe():
+    agent = _BatchAgent(batch_size=3)
+    updates = [observe(agent, terminal=False, reward=0) for _ in range(7)]
+    assert [False, False, True, False, True, False, True] == updates
+
+
+def test_luby():
+    expected = [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, 1]
+    assert expected == [luby(index) for index in range(1, 17)]
+
+
+def test_GeometricRestarts():
+    strategy = GeometricRestarts(10, factor=3.0)
+    assert not strategy.should_restart(9, None)
+    assert strategy.should_restart(11, None)
+    strategy.restarted()
+    assert not strategy.should_restart(29, None)
+    assert strategy.should_restart(31, None)
+
+
+def test_ProgressRestarts():
+    environment = _Environment()
+    strategy = ProgressRestarts(window=10)
+
+    # Test improvements postpone the restart
+    environment.add(0.5)
+    assert not strategy.should_restart(5, environment)
+    environment.add(0.3)
+    assert not strategy.should_restart(12, environment)
+    environment.add(0.4)
+    assert not strategy.should_restart(20, environment)
+    assert strategy.should_restart(23, environment)
+
+    # Test the best distance is forgotten on restart
+    strategy.restarted()
+    environment.add(0.4)
+    assert not strategy.should_restart(3, environment)
+    assert 0.4 == strategy._best
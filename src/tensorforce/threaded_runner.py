@@ -13,7 +13,8 @@
 # limitations under the License.
 # ==============================================================================
 
-# Changes include: adding timeout capability
+# Changes include: adding timeout capability, per-phase timings and tracing, an
+# event-driven coordinator with locked counters
 
 """
 Runner for non-realtime threaded execution of multiple agents.
@@ -29,10 +30,34 @@ from six.moves import xrange
 
 from tensorforce import TensorForceError
 
+from ..learna.profiling import PhaseTimer, merge_timings
+from .runner import observe
+
+
+class _Counter(object):
+    """
+    Integer counter which can be incremented from several threads.
+    """
+
+    def __init__(self, value=0):
+        self.value = value
+        self._lock = threading.Lock()
+
+    def increment(self, amount=1):
+        with self._lock:
+            self.value += amount
+            return self.value
+
 
 class ThreadedRunner(object):
     def __init__(
-        self, agents, environments, repeat_actions=1, save_path=None, save_episodes=None
+        self,
+        agents,
+        environments,
+        repeat_actions=1,
+        save_path=None,
+        save_episodes=None,
+        timers=None,
     ):
         """
         Initialize a Runner object.
@@ -43,6 +68,8 @@ class ThreadedRunner(object):
             repeat_actions:
             save_path:
             save_episodes:
+            timers: Optional PhaseTimer per agent to measure act, execute, observe and
+                update with. Their episode timings are added to the summary data.
         """
         if len(agents) != len(environments):
             raise TensorForceError(
@@ -55,6 +82,32 @@ class ThreadedRunner(object):
         self.repeat_actions = repeat_actions
         self.save_path = save_path
         self.save_episodes = save_episodes
+        self.timers = timers or [PhaseTimer(enabled=False) for _ in agents]
+
+    @property
+    def global_step(self):
+        return self._global_step.value
+
+    @property
+    def global_should_stop(self):
+        return self._stop.is_set()
+
+    def stop(self):
+        """
+        Signal all threads to stop after their current step, e.g. from episode_finished.
+        """
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def get_timings(self):
+        """
+        Get the time spent per phase over all finished episodes of all threads.
+
+        Returns:
+            Dictionary from phase names to the calls, wall and cpu time in seconds.
+        """
+        return merge_timings(timer.timings() for timer in self.timers)
 
     def _run_single(
         self,
@@ -76,36 +129,46 @@ class ThreadedRunner(object):
         Returns:
 
         """
+        timer = self.timers[thread_id]
         episode = 1
-        while not self.global_should_stop:
+        while not self._stop.is_set():
             state = environment.reset()
             agent.reset()
             episode_reward = 0
 
             timestep = 0
-            while True:
-                action = agent.act(states=state)
-                if repeat_actions > 1:
-                    reward = 0
-                    for repeat in xrange(repeat_actions):
-                        state, terminal, step_reward = environment.execute(actions=action)
-                        reward += step_reward
-                        if terminal:
-                            break
-                else:
-                    state, terminal, reward = environment.execute(actions=action)
-
-                agent.observe(reward=reward, terminal=terminal)
-
-                timestep += 1
-                self.global_step += 1
-                episode_reward += reward
-
-                if terminal or timestep == max_timesteps:
-                    break
-
-                if self.global_should_stop:
-                    return
+            with timer.phase("episode"):
+                while True:
+                    with timer.phase("act"):
+                        action = agent.act(states=state)
+                    with timer.phase("execute"):
+                        if repeat_actions > 1:
+                            reward = 0
+                            for repeat in xrange(repeat_actions):
+                                state, terminal, step_reward = environment.execute(
+                                    actions=action
+                                )
+                                reward += step_reward
+                                if terminal:
+                                    break
+                        else:
+                            state, terminal, reward = environment.execute(
+                                actions=action
+                            )
+
+                    with timer.phase("observe") as phase:
+                        if observe(agent, terminal=terminal, reward=reward):
+                            phase.name = "update"
+
+                    timestep += 1
+                    self._global_step.increment()
+                    episode_reward += reward
+
+                    if terminal or timestep == max_timesteps:
+                        break
+
+                    if self._stop.is_set():
+                        return
 
             # agent.observe_episode_reward(episode_reward)
             self.episode_rewards.append(episode_reward)
@@ -117,11 +180,24 @@ class ThreadedRunner(object):
                 "timestep": timestep,
                 "episode_reward": episode_reward,
             }
+            episode_timings = timer.end_episode()
+            if timer.enabled:
+                summary_data["timings"] = episode_timings
             if episode_finished and not episode_finished(summary_data):
                 return
 
             episode += 1
-            self.global_episode += 1
+            with self._condition:
+                self.global_episode += 1
+                self._condition.notify_all()
+
+    def _run_thread(self, *args, **kwargs):
+        try:
+            self._run_single(*args, **kwargs)
+        finally:
+            with self._condition:
+                self._running_threads -= 1
+                self._condition.notify_all()
 
     def run(
         self,
@@ -136,14 +212,17 @@ class ThreadedRunner(object):
         self.episode_rewards = []
         self.episode_lengths = []
 
-        self.global_step = 0
+        self._global_step = _Counter()
         self.global_episode = 1
-        self.global_should_stop = False
+        self._stop = threading.Event()
+        # Notified by the threads after every episode and when they end
+        self._condition = threading.Condition()
+        self._running_threads = len(self.agents)
 
         # Create threads
         threads = [
             threading.Thread(
-                target=self._run_single,
+                target=self._run_thread,
                 args=(t, self.agents[t], self.environments[t]),
                 kwargs={
                     "repeat_actions": self.repeat_actions,
@@ -161,26 +240,46 @@ class ThreadedRunner(object):
         try:
             next_summary = 0
             next_save = 0
-            while self.global_episode < episodes or episodes == -1:
+            seen_episode = None
+            while True:
+                with self._condition:
+                    if (
+                        self.global_episode == seen_episode
+                        and self._running_threads
+                        and not self._stop.is_set()
+                    ):
+                        remaining = None
+                        if timeout:
+                            remaining = max(timeout - (time.time() - self.start_time), 0)
+                        self._condition.wait(remaining)
+                    seen_episode = self.global_episode
+                    running_threads = self._running_threads
+
                 elapsed_time = time.time() - self.start_time
-                if timeout and timeout < elapsed_time:
+                if (
+                    episodes != -1
+                    and seen_episode >= episodes
+                    or timeout
+                    and timeout <= elapsed_time
+                    or not running_threads
+                    or self._stop.is_set()
+                ):
                     break
-                if self.global_episode > next_summary:
+                if summary_report and seen_episode > next_summary:
                     summary_report(self)
                     next_summary += summary_interval
                 if (
                     self.save_path
                     and self.save_episodes is not None
-                    and self.global_episode > next_save
+                    and seen_episode > next_save
                 ):
-                    print("Saving agent after episode {}".format(self.global_episode))
+                    print("Saving agent after episode {}".format(seen_episode))
                     self.agents[0].save_model(self.save_path)
                     next_save += self.save_episodes
-                time.sleep(1)
         except KeyboardInterrupt:
             print("Keyboard interrupt, sending stop command to threads")
 
-        self.global_should_stop = True
+        self._stop.set()
 
         # Join threads
         [t.join() for t in threads]